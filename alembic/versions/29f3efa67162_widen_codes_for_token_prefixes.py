@@ -0,0 +1,35 @@
+"""widen codes for token prefixes
+
+Revision ID: 29f3efa67162
+Revises: 7efa62c99c03
+Create Date: 2026-10-18 04:08:50.173449
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '29f3efa67162'
+down_revision: Union[str, None] = '7efa62c99c03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Codes now carry a type prefix, e.g. `ac_` followed by 32 characters
+    with op.batch_alter_table('codes', schema=None) as batch_op:
+        batch_op.alter_column('code',
+               existing_type=sa.String(length=32),
+               type_=sa.String(length=64),
+               existing_nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('codes', schema=None) as batch_op:
+        batch_op.alter_column('code',
+               existing_type=sa.String(length=64),
+               type_=sa.String(length=32),
+               existing_nullable=False)
@@ -0,0 +1,35 @@
+"""store joined_at with time zone
+
+Revision ID: 7efa62c99c03
+Revises: e4d9d6f4786e
+Create Date: 2026-10-18 03:53:54.954208
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7efa62c99c03'
+down_revision: Union[str, None] = 'e4d9d6f4786e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite has no separate type for this, so only PostgreSQL sees a change
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('joined_at',
+               existing_type=sa.DateTime(),
+               type_=sa.DateTime(timezone=True),
+               existing_nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('joined_at',
+               existing_type=sa.DateTime(timezone=True),
+               type_=sa.DateTime(),
+               existing_nullable=False)
@@ -1 +1,11 @@
-from .instance import app as app
+from typing import Any
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    # Build the app on first access only, so that the command line tools in this
+    # package do not pay for it
+    if name == "app":
+        from .instance import app  # noqa: PLC0415
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")  # noqa: TRY003
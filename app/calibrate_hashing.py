@@ -0,0 +1,139 @@
+"""Propose Argon2 parameters that hash a password within a latency budget here.
+
+Usage:
+    python -m app.calibrate_hashing --target-ms 250
+    python -m app.calibrate_hashing --target-ms 100 --max-memory 65536
+
+Memory is doubled from `--min-memory` KiB for as long as a single pass still
+fits the budget, then passes are added at that memory until the next one would
+not. Memory cost is preferred over time cost because it is what makes GPU and
+ASIC attacks expensive. Run it on the machine class that serves logins, and keep
+in mind that `HASH_WORKERS` hashes may run at once, each taking the memory cost.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from dataclasses import dataclass
+
+import argon2
+
+from settings import identity_app_settings
+
+PASSWORD = "calibration password"  # noqa: S105
+
+
+@dataclass(frozen=True, slots=True)
+class Candidate:
+    time_cost: int
+    memory_cost: int  # KiB
+    parallelism: int
+    seconds: float
+
+
+def time_hash(
+    time_cost: int, memory_cost: int, parallelism: int, samples: int
+) -> Candidate:
+    """Hash `samples` times with the given parameters and keep the median time."""
+    hasher = argon2.PasswordHasher(
+        time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+    )
+    hasher.hash(PASSWORD)  # Warm up the allocator
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash(PASSWORD)
+        durations.append(time.perf_counter() - started)
+    return Candidate(time_cost, memory_cost, parallelism, statistics.median(durations))
+
+
+def calibrate(
+    target: float,
+    *,
+    min_memory: int,
+    max_memory: int,
+    parallelism: int,
+    samples: int,
+) -> list[Candidate]:
+    """Find the most expensive parameters per memory cost that fit `target`.
+
+    Returns:
+        list[Candidate]: One candidate per memory cost that fits, by increasing
+            memory cost; the last one is the recommendation.
+
+    """
+    candidates = []
+    memory_cost = min_memory
+    while memory_cost <= max_memory:
+        best = time_hash(1, memory_cost, parallelism, samples)
+        if best.seconds > target:
+            break
+        # Time grows about linearly with passes; start from the estimate
+        time_cost = max(1, int(target / best.seconds))
+        while time_cost > 1:
+            candidate = time_hash(time_cost, memory_cost, parallelism, samples)
+            if candidate.seconds <= target:
+                best = candidate
+                break
+            time_cost -= 1
+        candidates.append(best)
+        print(
+            f"memory_cost={best.memory_cost:>8} KiB  time_cost={best.time_cost:>3}"
+            f"  {best.seconds * 1000:8.1f}ms"
+        )
+        memory_cost *= 2
+    return candidates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--min-memory", type=int, default=4096, help="KiB")
+    parser.add_argument("--max-memory", type=int, default=262144, help="KiB")
+    parser.add_argument(
+        "--parallelism", type=int, default=identity_app_settings.argon2_parallelism
+    )
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+    if args.min_memory < 8 * args.parallelism:
+        parser.error("--min-memory must be at least 8 KiB times --parallelism")
+
+    current = time_hash(
+        identity_app_settings.argon2_time_cost,
+        identity_app_settings.argon2_memory_cost,
+        identity_app_settings.argon2_parallelism,
+        args.samples,
+    )
+    print(
+        f"current: memory_cost={current.memory_cost} KiB"
+        f" time_cost={current.time_cost} parallelism={current.parallelism}"
+        f" {current.seconds * 1000:.1f}ms\n"
+    )
+
+    candidates = calibrate(
+        args.target_ms / 1000,
+        min_memory=args.min_memory,
+        max_memory=args.max_memory,
+        parallelism=args.parallelism,
+        samples=args.samples,
+    )
+    if not candidates:
+        parser.exit(1, f"Even {args.min_memory} KiB takes over {args.target_ms}ms\n")
+
+    best = candidates[-1]
+    workers = identity_app_settings.hash_workers
+    print(
+        f"\nProposed, {best.seconds * 1000:.1f}ms per hash and up to"
+        f" {best.memory_cost * workers // 1024} MiB with {workers} hash workers:"
+    )
+    print(f"ARGON2_TIME_COST={best.time_cost}")
+    print(f"ARGON2_MEMORY_COST={best.memory_cost}")
+    print(f"ARGON2_PARALLELISM={best.parallelism}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from sqlalchemy import select
+
+from db_models import OAuthApp
+from utils.caches import TTLCache
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+@dataclass(frozen=True, slots=True)
+class ClientRecord:
+    """Immutable snapshot of an `OAuthApp` row, safe to share between requests."""
+
+    id: int
+    app_name: str
+    app_desc: str
+    app_icon_url: str | None
+    client_id: str
+    client_secret: str
+    redirect_uri: str
+    allowed_scopes: str
+    access_token_format: str
+
+    @classmethod
+    def from_model(cls, oauth_app: OAuthApp) -> ClientRecord:
+        return cls(
+            id=oauth_app.id,
+            app_name=oauth_app.app_name,
+            app_desc=oauth_app.app_desc,
+            app_icon_url=oauth_app.app_icon_url,
+            client_id=oauth_app.client_id,
+            client_secret=oauth_app.client_secret,
+            redirect_uri=oauth_app.redirect_uri,
+            allowed_scopes=oauth_app.allowed_scopes,
+            access_token_format=oauth_app.access_token_format,
+        )
+
+
+class ClientRegistry:
+    """Read-through cache of OAuth clients keyed by `client_id`.
+
+    Found clients are cached for `ttl` seconds, unknown client IDs for
+    `negative_ttl` seconds in a separate cache so that junk IDs cannot evict real
+    clients. Concurrent misses for the same client ID share a single query.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        *,
+        ttl: float,
+        negative_ttl: float,
+        maxsize: int,
+    ) -> None:
+        self._session_maker = session_maker
+        self._found: TTLCache[str, ClientRecord] = TTLCache(maxsize, ttl)
+        self._not_found: TTLCache[str, bool] = TTLCache(maxsize, negative_ttl)
+        self._inflight: dict[str, asyncio.Task[ClientRecord | None]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, client_id: str) -> ClientRecord | None:
+        record = self._found.get(client_id)
+        if record is not None:
+            self.hits += 1
+            return record
+        if self._not_found.get(client_id):
+            self.hits += 1
+            return None
+
+        self.misses += 1
+        task = self._inflight.get(client_id)
+        if task is None:
+            task = asyncio.create_task(self._load(client_id))
+            self._inflight[client_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(client_id, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, client_id: str) -> ClientRecord | None:
+        async with self._session_maker() as db_session:
+            stmt = select(OAuthApp).where(OAuthApp.client_id == client_id)
+            oauth_app = (await db_session.execute(stmt)).scalar_one_or_none()
+
+        if oauth_app is None:
+            self._not_found.set(client_id, True)
+            return None
+
+        record = ClientRecord.from_model(oauth_app)
+        self._found.set(client_id, record)
+        return record
+
+    def invalidate(self, client_id: str) -> None:
+        self._found.pop(client_id)
+        self._not_found.pop(client_id)
+
+    def clear(self) -> None:
+        self._found.clear()
+        self._not_found.clear()
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Literal
+
+from sqlalchemy import delete
+
+from app.sweeper import purge_expired_rows
+from db_models import Code
+
+if TYPE_CHECKING:
+    from db_manager import SessionFactory
+
+
+@dataclass(frozen=True, slots=True)
+class AuthorizationCode:
+    code: str
+    client_id: str
+    scope: str
+    redirect_uri: str
+    user_id: int
+    nonce: str | None
+    auth_time: datetime
+    created_at: datetime
+    expires_at: datetime
+
+
+class CodeStore(ABC):
+    """Where issued authorization codes live until they are redeemed or expire."""
+
+    @abstractmethod
+    async def save(self, code: AuthorizationCode) -> None: ...
+
+    @abstractmethod
+    async def consume(self, code: str) -> AuthorizationCode | None:
+        """Atomically remove and return an unexpired code.
+
+        Returns:
+            AuthorizationCode | None: The code, or `None` if it does not exist, has
+                expired or was already consumed.
+
+        """
+
+    @abstractmethod
+    async def purge_expired(self, batch_size: int) -> int:
+        """Drop expired codes, at most `batch_size` at a time.
+
+        Returns:
+            int: The number of codes dropped.
+
+        """
+
+
+class SQLCodeStore(CodeStore):
+    """Codes stored in the `codes` table; works across workers and restarts."""
+
+    def __init__(self, session_factory: SessionFactory) -> None:
+        self._session_factory = session_factory
+
+    async def save(self, code: AuthorizationCode) -> None:
+        async with self._session_factory() as db_session:
+            db_session.add(
+                Code(
+                    code=code.code,
+                    client_id=code.client_id,
+                    scope=code.scope,
+                    redirect_uri=code.redirect_uri,
+                    user_id=code.user_id,
+                    nonce=code.nonce,
+                    auth_time=code.auth_time,
+                    created_at=code.created_at,
+                    expires_at=code.expires_at,
+                )
+            )
+            await db_session.commit()
+
+    async def consume(self, code: str) -> AuthorizationCode | None:
+        stmt = (
+            delete(Code)
+            .where(Code.code == code, Code.expires_at > datetime.now(UTC))
+            .returning(
+                Code.code,
+                Code.client_id,
+                Code.scope,
+                Code.redirect_uri,
+                Code.user_id,
+                Code.nonce,
+                Code.auth_time,
+                Code.created_at,
+                Code.expires_at,
+            )
+        )
+        async with self._session_factory() as db_session:
+            row = (
+                await db_session.execute(
+                    stmt, execution_options={"synchronize_session": False}
+                )
+            ).one_or_none()
+            await db_session.commit()
+
+        if row is None:
+            return None
+
+        return AuthorizationCode(**row._asdict())
+
+    async def purge_expired(self, batch_size: int) -> int:
+        return await purge_expired_rows(
+            self._session_factory, Code, Code.code, Code.expires_at, batch_size
+        )
+
+
+class MemoryCodeStore(CodeStore):
+    """Codes kept in process memory, with a min-heap ordered by expiry.
+
+    Saving and redeeming a code costs no I/O at all, but codes are lost on restart
+    and are not shared between workers, so this is only for single-process
+    deployments.
+    """
+
+    def __init__(self) -> None:
+        self._codes: dict[str, AuthorizationCode] = {}
+        self._expiry: list[tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    async def save(self, code: AuthorizationCode) -> None:
+        self._codes[code.code] = code
+        heapq.heappush(self._expiry, (code.expires_at.timestamp(), code.code))
+
+    async def consume(self, code: str) -> AuthorizationCode | None:
+        code_obj = self._codes.pop(code, None)
+        if code_obj is None or code_obj.expires_at <= datetime.now(UTC):
+            return None
+        return code_obj
+
+    async def purge_expired(self, batch_size: int) -> int:
+        now = datetime.now(UTC).timestamp()
+        purged = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, code = heapq.heappop(self._expiry)
+            code_obj = self._codes.get(code)
+            # The heap keeps entries of consumed codes; only count live ones
+            if code_obj is not None and code_obj.expires_at.timestamp() <= now:
+                del self._codes[code]
+                purged += 1
+                if purged % batch_size == 0:
+                    await asyncio.sleep(0)
+        return purged
+
+
+def create_code_store(
+    backend: Literal["sql", "memory"],
+    session_factory: SessionFactory,
+) -> CodeStore:
+    if backend == "memory":
+        return MemoryCodeStore()
+    return SQLCodeStore(session_factory)
@@ -0,0 +1,292 @@
+"""Bulk-import users from CSV or JSON Lines.
+
+Usage:
+    python -m app.import_users users.csv
+    python -m app.import_users users.jsonl --batch-size 2000 --workers 8
+
+Every record needs `username`, `email`, `nickname` and either a plaintext
+`password` or an Argon2 `hashed_password`, which is stored as-is. `avatar_url`,
+`bio`, `birth`, `website`, `phone` and `joined_at` are optional.
+
+Records whose username or email is already taken, in the database or earlier in
+the input, are skipped. An interrupted import can therefore be resumed by running
+the same command again.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+from itertools import batched
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal, Self
+
+import argon2
+from argon2.exceptions import InvalidHashError
+from pydantic import (
+    BaseModel,
+    Field,
+    ValidationError,
+    field_validator,
+    model_validator,
+)
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from db_manager import dispose_engines, read_session_maker, write_session
+from db_models import User
+from settings import identity_app_settings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+class ImportedUser(BaseModel):
+    username: str = Field(pattern=r"^[^@]+$", max_length=16)
+    email: str = Field(max_length=32)
+    nickname: str = Field(max_length=32)
+    password: str | None = None
+    hashed_password: str | None = Field(default=None, pattern=r"^\$argon2(id|i|d)\$")
+    avatar_url: str | None = Field(default=None, max_length=96)
+    bio: str | None = None
+    birth: date | None = None
+    website: str | None = Field(default=None, max_length=64)
+    phone: str | None = Field(default=None, max_length=16)
+    joined_at: datetime | None = None
+
+    @field_validator("hashed_password")
+    @classmethod
+    def check_hash(cls, value: str | None) -> str | None:
+        if value is None:
+            return value
+        try:
+            params = argon2.extract_parameters(value)
+        except InvalidHashError:
+            raise ValueError("Not a valid Argon2 hash") from None  # noqa: TRY003
+        # Shorter salts and digests parse, but libargon2 refuses them on verify
+        if params.salt_len < 8 or params.hash_len < 4:  # noqa: PLR2004
+            raise ValueError("Argon2 salt or digest is too short")  # noqa: TRY003
+        return value
+
+    @model_validator(mode="after")
+    def check_password(self) -> Self:
+        if (self.password is None) == (self.hashed_password is None):
+            raise ValueError("Exactly one of password and hashed_password is required")  # noqa: TRY003
+        return self
+
+
+@dataclass(slots=True)
+class ImportStats:
+    read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+
+
+type Record = dict[str, Any] | str
+
+
+def read_records(
+    path: Path, file_format: Literal["csv", "jsonl"]
+) -> Iterator[tuple[int, Record]]:
+    """Yield `(line number, record)` pairs, dropping empty fields.
+
+    Lines that are not a JSON object yield an error message instead of a record,
+    so that one bad line does not abort the import.
+    """
+    with path.open(newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, {k: v for k, v in record.items() if v}
+        else:
+            for line_num, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_num, f"invalid JSON: {e.msg}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_num, "not a JSON object"
+                    continue
+                yield line_num, {k: v for k, v in record.items() if v is not None}
+
+
+def _hash_many(hasher: argon2.PasswordHasher, passwords: list[str]) -> list[str]:
+    return [hasher.hash(password) for password in passwords]
+
+
+class UserImporter:
+    """Validate, dedupe, hash and insert users a batch at a time.
+
+    Passwords of a batch are hashed across the executor while the previous batch
+    is being inserted, and each batch is inserted with one executemany in its own
+    transaction.
+    """
+
+    def __init__(
+        self, executor: Executor, workers: int, hasher: argon2.PasswordHasher
+    ) -> None:
+        self.executor = executor
+        self.workers = workers
+        self.hasher = hasher
+        self.stats = ImportStats()
+        self.usernames: set[str] = set()
+        self.emails: set[str] = set()
+
+    async def load_existing(self) -> None:
+        async with read_session_maker() as db_session:
+            result = await db_session.stream(select(User.username, User.email))
+            async for username, email in result:
+                self.usernames.add(username)
+                self.emails.add(email)
+
+    def skip_invalid(self, line_num: int, message: str) -> None:
+        self.stats.invalid += 1
+        print(f"line {line_num}: {message}", file=sys.stderr)
+
+    def validate(self, records: tuple[tuple[int, Record], ...]) -> list[ImportedUser]:
+        users = []
+        for line_num, record in records:
+            self.stats.read += 1
+            if isinstance(record, str):
+                self.skip_invalid(line_num, record)
+                continue
+            try:
+                user = ImportedUser.model_validate(record)
+            except ValidationError as e:
+                error = e.errors()[0]
+                self.skip_invalid(
+                    line_num, f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                )
+                continue
+            if user.username in self.usernames or user.email in self.emails:
+                self.stats.duplicates += 1
+                continue
+            self.usernames.add(user.username)
+            self.emails.add(user.email)
+            users.append(user)
+        return users
+
+    async def hash_passwords(self, users: list[ImportedUser]) -> list[dict[str, Any]]:
+        plain = [user for user in users if user.password is not None]
+        chunk_size = max(1, -(-len(plain) // self.workers))
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.executor,
+                    _hash_many,
+                    self.hasher,
+                    [user.password for user in chunk if user.password is not None],
+                )
+                for chunk in batched(plain, chunk_size, strict=False)
+            )
+        )
+        hashes = iter(hashed for chunk in chunks for hashed in chunk)
+
+        now = datetime.now(UTC)
+        rows = []
+        for user in users:
+            row = user.model_dump(exclude={"password"})
+            if user.password is not None:
+                row["hashed_password"] = next(hashes)
+            row["joined_at"] = user.joined_at or now
+            rows.append(row)
+        return rows
+
+    async def insert(self, rows: list[dict[str, Any]]) -> None:
+        try:
+            async with write_session() as db_session:
+                await db_session.execute(insert(User), rows)
+                await db_session.commit()
+            self.stats.inserted += len(rows)
+        except IntegrityError:
+            # Someone registered one of these users meanwhile; insert the rest
+            for row in rows:
+                try:
+                    async with write_session() as db_session:
+                        await db_session.execute(insert(User), row)
+                        await db_session.commit()
+                    self.stats.inserted += 1
+                except IntegrityError:
+                    self.stats.duplicates += 1
+
+    async def run(
+        self, records: Iterator[tuple[int, Record]], batch_size: int
+    ) -> ImportStats:
+        await self.load_existing()
+        started = time.perf_counter()
+        inserting: asyncio.Task[None] | None = None
+        for batch in batched(records, batch_size, strict=False):
+            rows = await self.hash_passwords(self.validate(batch))
+            if inserting is not None:
+                await inserting
+            inserting = asyncio.create_task(self.insert(rows))
+            self.report(started)
+        if inserting is not None:
+            await inserting
+        self.report(started)
+        return self.stats
+
+    def report(self, started: float) -> None:
+        stats = self.stats
+        elapsed = time.perf_counter() - started
+        print(
+            f"read {stats.read}, inserted {stats.inserted}, "
+            f"skipped {stats.duplicates} duplicates and {stats.invalid} invalid, "
+            f"{stats.read / elapsed if elapsed else 0:.0f} records/s",
+            file=sys.stderr,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=["csv", "jsonl"], dest="file_format")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    args = parser.parse_args()
+
+    file_format = args.file_format or ("csv" if args.path.suffix == ".csv" else "jsonl")
+    executor_cls = (
+        ProcessPoolExecutor if args.executor == "process" else ThreadPoolExecutor
+    )
+
+    # Built here rather than imported from app.instance, which sets up the whole app
+    hasher = argon2.PasswordHasher(
+        time_cost=identity_app_settings.argon2_time_cost,
+        memory_cost=identity_app_settings.argon2_memory_cost,
+        parallelism=identity_app_settings.argon2_parallelism,
+    )
+
+    async def import_file(executor: Executor) -> ImportStats:
+        importer = UserImporter(executor, args.workers, hasher)
+        try:
+            return await importer.run(
+                read_records(args.path, file_format), args.batch_size
+            )
+        finally:
+            await dispose_engines()
+
+    with executor_cls(max_workers=args.workers) as executor:
+        stats = asyncio.run(import_file(executor))
+    if stats.invalid:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
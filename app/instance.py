@@ -1,43 +1,121 @@
 from __future__ import annotations
 
-import base64
+import asyncio
+import contextlib
+import hashlib
+import hmac
 import logging
+import secrets
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
-from datetime import UTC, datetime, timedelta
+from datetime import UTC, date, datetime, timedelta
 from enum import StrEnum
 from functools import lru_cache
-from typing import Annotated, Literal
+from typing import Annotated, Any, Literal
 
 import argon2
 import jwt
-from argon2.exceptions import VerifyMismatchError
-from Cryptodome.PublicKey import RSA
-from fastapi import Depends, FastAPI, Form, HTTPException, Request, Response
+from argon2.exceptions import InvalidHashError, VerificationError
+from fastapi import (
+    BackgroundTasks,
+    Depends,
+    FastAPI,
+    Form,
+    HTTPException,
+    Request,
+    Response,
+)
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel, ConfigDict
-from sqlalchemy import select
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
 
 import settings as settings
-from db_manager import get_db
-from db_models import Code, OAuthApp, User
+from app.clients import ClientRecord, ClientRegistry
+from app.code_store import AuthorizationCode, create_code_store
+from app.metrics import (
+    MetricsMiddleware,
+    flush_metrics,
+    observe_argon2,
+    observe_jwt,
+    register_cache_metrics,
+    register_hashing_metrics,
+    render_metrics,
+)
+from app.rate_limit import RateLimitedError, RateLimiter, create_rate_limit_store
+from app.revocation import RevocationList
+from app.sweeper import purge_expired_rows
+from db_manager import get_read_db, read_session_maker, write_session
+from db_models import AccessToken, Base, RefreshToken, User
 from settings import identity_app_settings
-from utils.randoms import random_str
+from utils.caches import TTLCache
+from utils.hashing import HashingBusyError, PasswordHashingService
+from utils.http_cache import StaticDocument
+from utils.keyring import Key, KeyRing
 from utils.servers import detect_server as detect_server
+from utils.tokens import TokenKind, mint, token_kind
 
 
 @asynccontextmanager
 async def lifespan(application: FastAPI) -> AsyncGenerator:
+    await revocations.sync(overlap=0)
+    background_tasks = [
+        asyncio.create_task(
+            flush_metrics(identity_app_settings.metrics_flush_interval)
+        ),
+        asyncio.create_task(
+            revocations.run_sync(identity_app_settings.revocation_sync_interval)
+        ),
+    ]
     yield
+    for task in background_tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    hashing_service.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
-hasher = argon2.PasswordHasher(time_cost=1, memory_cost=4096)
+app.add_middleware(MetricsMiddleware)
+hasher = argon2.PasswordHasher(
+    time_cost=identity_app_settings.argon2_time_cost,
+    memory_cost=identity_app_settings.argon2_memory_cost,
+    parallelism=identity_app_settings.argon2_parallelism,
+)
+hashing_service = PasswordHashingService(
+    hasher,
+    executor=identity_app_settings.hash_executor,
+    max_workers=identity_app_settings.hash_workers,
+    max_pending=identity_app_settings.hash_max_pending,
+    retry_after=identity_app_settings.hash_retry_after,
+    observe=observe_argon2,
+)
+register_hashing_metrics(hashing_service)
 logger = logging.getLogger(__name__)
 tz = datetime.now(UTC).astimezone().tzinfo
 
 
+@app.exception_handler(RateLimitedError)
+async def rate_limited_handler(request: Request, exc: RateLimitedError) -> Response:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(HashingBusyError)
+async def hashing_busy_handler(request: Request, exc: HashingBusyError) -> Response:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 class OpenIDConfig(BaseModel):
     issuer: str
     authorization_endpoint: str
@@ -46,27 +124,39 @@ class OpenIDConfig(BaseModel):
     jwks_uri: str
 
 
-@app.get("/.well-known/openid-configuration")
-async def openid_configuration(request: Request) -> OpenIDConfig:
-    host = request.headers.get("Host")
-    return OpenIDConfig(
+@lru_cache(maxsize=64)
+def render_openid_configuration(host: str | None) -> StaticDocument:
+    config = OpenIDConfig(
         issuer=identity_app_settings.issuer,
         authorization_endpoint=f"https://{host}/#/authorize",
         token_endpoint=f"https://{host}/api/token",
         userinfo_endpoint=f"https://{host}/api/userinfo",
         jwks_uri=f"https://{host}/.well-known/jwks.json",
     )
+    return StaticDocument.from_bytes(config.model_dump_json().encode())
+
+
+@app.get(
+    "/.well-known/openid-configuration",
+    response_model=OpenIDConfig,
+    responses={304: {"description": "Not Modified"}},
+)
+async def openid_configuration(request: Request) -> Response:
+    document = render_openid_configuration(request.headers.get("Host"))
+    return document.response(
+        request, f"public, max-age={identity_app_settings.well_known_max_age}"
+    )
 
 
 class JWKBase(BaseModel):
-    kty: Literal["RSA", "EC", "oct"]
+    kty: Literal["RSA", "EC", "OKP", "oct"]
     use: Literal["enc", "sig"]
     alg: str | None = None
     kid: str | None = None
 
 
 class JWKEc(JWKBase):
-    kty: Literal["RSA", "EC", "oct"] = "EC"
+    kty: Literal["RSA", "EC", "OKP", "oct"] = "EC"
     alg: str | None = "ES256"
     crv: str
     x: str
@@ -75,54 +165,135 @@ class JWKEc(JWKBase):
 
 
 class JWKRsa(JWKBase):
-    kty: Literal["RSA", "EC", "oct"] = "RSA"
+    kty: Literal["RSA", "EC", "OKP", "oct"] = "RSA"
     alg: str | None = "RS256"
     n: str
     e: str
     d: str | None = None
 
 
+class JWKOkp(JWKBase):
+    kty: Literal["RSA", "EC", "OKP", "oct"] = "OKP"
+    alg: str | None = "EdDSA"
+    crv: str
+    x: str
+    d: str | None = None
+
+
 class JWKs(BaseModel):
-    keys: list[JWKEc | JWKRsa]
+    keys: list[JWKEc | JWKRsa | JWKOkp]
 
 
-@lru_cache
-def get_rsa_key_params() -> tuple[int, int]:
-    key = get_ec_pri_key()
-    return key.n, key.e
+def load_keyring() -> KeyRing:
+    keys = [
+        Key.from_pem(
+            "main",
+            "RS256",
+            private_pem=identity_app_settings.rsa_pri_key,
+            public_pem=identity_app_settings.rsa_pub_key,
+        )
+    ]
+    keys.extend(
+        Key.from_pem(
+            key.kid,
+            key.alg,
+            private_pem=key.private_key,
+            public_pem=key.public_key,
+            retiring=key.status == "retiring",
+        )
+        for key in identity_app_settings.signing_keys
+    )
+    return KeyRing(
+        keys, signing_kid=identity_app_settings.signing_kid, observe=observe_jwt
+    )
 
 
-@lru_cache
-def get_ec_pri_key() -> RSA.RsaKey:
-    return RSA.import_key(identity_app_settings.rsa_pri_key)
+keyring = load_keyring()
 
 
-@lru_cache
-def int_to_base64_octet_string(num: int) -> str:
-    length = num.bit_length()
-    bytes_length = (length + 7) // 8
-    return (
-        base64.urlsafe_b64encode(num.to_bytes(bytes_length, "big"))
-        .rstrip(b"=")
-        .decode()
-    )
+@lru_cache(maxsize=1)
+def render_jwks(keyring_version: int) -> StaticDocument:  # Keyed on the key set version
+    jwks = JWKs.model_validate({"keys": keyring.jwks()})
+    return StaticDocument.from_bytes(jwks.model_dump_json(exclude_none=True).encode())
 
 
-@app.get("/.well-known/jwks.json")
-async def get_jwks() -> JWKs:
-    params = get_rsa_key_params()
-    return JWKs(
-        keys=[
-            JWKRsa(
-                kid="main",
-                use="sig",
-                n=int_to_base64_octet_string(int(params[0])),
-                e=int_to_base64_octet_string(int(params[1])),
-            )
-        ]
+@app.get(
+    "/.well-known/jwks.json",
+    response_model=JWKs,
+    responses={304: {"description": "Not Modified"}},
+)
+async def get_jwks(request: Request) -> Response:
+    document = render_jwks(keyring.version)
+    return document.response(
+        request, f"public, max-age={identity_app_settings.well_known_max_age}"
     )
 
 
+session_token_cache: TTLCache[bytes, dict[str, Any]] = TTLCache(
+    maxsize=identity_app_settings.session_cache_size
+)
+
+
+def _session_cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def verify_session_token(token: str) -> dict[str, Any]:
+    """Verify a session token, skipping the signature check for cached ones.
+
+    Verified claims are cached under a digest of the token until the token expires.
+    """
+    key = _session_cache_key(token)
+    claims = session_token_cache.get(key)
+    if claims is None:
+        claims = keyring.verify(token)
+        if "exp" in claims:
+            session_token_cache.set(key, claims, expires_at=claims["exp"])
+    if "jti" in claims and revocations.is_revoked(claims["jti"]):
+        raise jwt.InvalidTokenError("Token revoked")  # noqa: TRY003
+    return claims
+
+
+def invalidate_session_token(token: str) -> None:
+    session_token_cache.pop(_session_cache_key(token))
+
+
+code_store = create_code_store(identity_app_settings.code_store, write_session)
+rate_limiter = RateLimiter(
+    create_rate_limit_store(
+        identity_app_settings.rate_limit_store,
+        identity_app_settings.rate_limit_window,
+        write_session,
+    ),
+    {
+        "login:ip": identity_app_settings.rate_limit_login_per_ip,
+        "login:account": identity_app_settings.rate_limit_login_per_account,
+        "register:ip": identity_app_settings.rate_limit_register_per_ip,
+        "token:ip": identity_app_settings.rate_limit_token_per_ip,
+        "token:client": identity_app_settings.rate_limit_token_per_client,
+    },
+)
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, uvicorn --proxy-headers puts the forwarded address here
+    return request.client.host if request.client else "unknown"
+
+
+revocations = RevocationList(
+    write_session,
+    read_session_maker,
+    capacity=identity_app_settings.revocation_filter_capacity,
+    error_rate=identity_app_settings.revocation_filter_error_rate,
+)
+client_registry = ClientRegistry(
+    read_session_maker,
+    ttl=identity_app_settings.client_cache_ttl,
+    negative_ttl=identity_app_settings.client_cache_negative_ttl,
+    maxsize=identity_app_settings.client_cache_size,
+)
+
+
 class ClientInfo(BaseModel):
     status: int = 500
     id: int = -1
@@ -147,22 +318,19 @@ class ErrorWithDetail(BaseModel):
         "404": {"model": ErrorWithDetail},
     },
 )
-async def client_info(
-    client_id: str,
-    db_session: Annotated[AsyncSession, Depends(get_db)],
-) -> ClientInfo:
-    stmt = select(OAuthApp).where(OAuthApp.client_id == client_id)
-    result = (await db_session.execute(stmt)).one_or_none()
+async def client_info(client_id: str) -> ClientInfo:
+    oauth_app = await client_registry.get(client_id)
 
-    if not result:
+    if not oauth_app:
         raise HTTPException(status_code=404, detail="Client not found")
-    return ClientInfo(status=200, **jsonable_encoder(result[0]))
+    return ClientInfo(status=200, **jsonable_encoder(oauth_app))
 
 
 class ApproveData(BaseModel):
     client_id: str
     redirect_uri: str
     scope: str
+    nonce: str | None = Field(default=None, max_length=256)
 
 
 class CodeResponse(BaseModel):
@@ -182,61 +350,244 @@ class CodeResponse(BaseModel):
 async def approve_authorize(
     data: ApproveData,
     request: Request,
-    db_session: Annotated[AsyncSession, Depends(get_db)],
 ) -> CodeResponse:
     if "token" not in request.cookies:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
     try:
-        decoded = jwt.decode(
-            request.cookies["token"],
-            key=identity_app_settings.rsa_pub_key,
-            algorithms=["RS256"],
-        )
-    except jwt.InvalidSignatureError as e:
-        raise HTTPException(status_code=401, detail="Token invalid") from e
+        decoded = verify_session_token(request.cookies["token"])
     except jwt.ExpiredSignatureError as e:
         raise HTTPException(status_code=401, detail="Token expired") from e
+    except jwt.InvalidTokenError as e:
+        raise HTTPException(status_code=401, detail="Token invalid") from e
 
     user_id = decoded["user_id"]
+    auth_time = datetime.fromtimestamp(decoded["iat"], tz=UTC)
 
-    stmt = select(OAuthApp).where(OAuthApp.client_id == data.client_id)
-    oauth_app_result = (await db_session.execute(stmt)).one_or_none()
-
-    if not oauth_app_result:
+    if not await client_registry.get(data.client_id):
         raise HTTPException(status_code=404, detail="Invalid client_id")
-    _oauth_app_obj: OAuthApp = oauth_app_result[0]
 
-    code_obj = Code(
-        code=random_str(32),
+    now = datetime.now(UTC)
+    code_obj = AuthorizationCode(
+        code=mint(TokenKind.AUTHORIZATION_CODE),
         client_id=data.client_id,
         scope=data.scope,
         redirect_uri=data.redirect_uri,
-        access_token=random_str(32),
-        id_token=jwt.encode(
-            {"user_id": user_id},
-            key=identity_app_settings.rsa_pri_key,
-            algorithm="RS256",
-            headers={"kid": "main"},
-        ),
+        user_id=user_id,
+        nonce=data.nonce,
+        auth_time=auth_time,
+        created_at=now,
+        expires_at=now + timedelta(seconds=identity_app_settings.code_ttl),
     )
-    db_session.add(code_obj)
-    code = code_obj.code
+    await code_store.save(code_obj)
 
-    await db_session.commit()
-
-    return CodeResponse(code=code)
+    return CodeResponse(code=code_obj.code)
 
 
 class TokenResponse(BaseModel):
     access_token: str
+    token_type: str = "Bearer"  # noqa: S105
     scope: str
     expires_in: int
+    refresh_token: str | None = None
     id_token: str | None = None
 
 
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def purge_expired_access_tokens(batch_size: int) -> int:
+    return await purge_expired_rows(
+        write_session,
+        AccessToken,
+        AccessToken.token_hash,
+        AccessToken.expires_at,
+        batch_size,
+    )
+
+
+async def purge_expired_refresh_tokens(batch_size: int) -> int:
+    return await purge_expired_rows(
+        write_session,
+        RefreshToken,
+        RefreshToken.token_hash,
+        RefreshToken.expires_at,
+        batch_size,
+    )
+
+
+async def authenticate_client(client_id: str, client_secret: str) -> ClientRecord:
+    """Check client credentials against the cached client, in constant time.
+
+    Clients are served from `client_registry`, so authenticating does not hit the
+    database while the client is cached.
+    """
+    oauth_app = await client_registry.get(client_id)
+    if not oauth_app:
+        raise HTTPException(status_code=404, detail="Invalid client_id")
+    if not hmac.compare_digest(
+        oauth_app.client_secret.encode(), client_secret.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid client_secret")
+    return oauth_app
+
+
+def mint_tokens(
+    oauth_app: ClientRecord,
+    user_id: int | None,
+    scope: str,
+    family_id: str | None = None,
+) -> tuple[TokenResponse, list[Base]]:
+    """Mint an access token and, if enabled, a refresh token.
+
+    Args:
+        oauth_app (ClientRecord): The client the tokens are for.
+        user_id (int | None): The user the tokens act for, or `None` when the
+            client acts for itself, in which case no refresh token is minted.
+        scope (str): The granted scope.
+        family_id (str | None): The family of the refresh token being rotated.
+            Defaults to starting a new family.
+
+    Returns:
+        tuple[TokenResponse, list[Base]]: The response, and the rows the caller
+            must add to the database before returning it.
+
+    """
+    now = datetime.now(UTC)
+    rows: list[Base] = []
+    if oauth_app.access_token_format == "jwt":  # noqa: S105
+        access_token = mint_jwt_access_token(user_id, oauth_app.client_id, scope)
+        expires_in = identity_app_settings.jwt_access_token_ttl
+    else:
+        access_token = mint(TokenKind.ACCESS_TOKEN)
+        expires_in = identity_app_settings.access_token_ttl
+        rows.append(
+            AccessToken(
+                token_hash=hash_token(access_token),
+                user_id=user_id,
+                client_id=oauth_app.client_id,
+                scope=scope,
+                expires_at=now + timedelta(seconds=expires_in),
+            )
+        )
+
+    resp_data = TokenResponse(
+        access_token=access_token, scope=scope, expires_in=expires_in
+    )
+    if user_id is not None and identity_app_settings.refresh_token_ttl:
+        resp_data.refresh_token = mint(TokenKind.REFRESH_TOKEN)
+        rows.append(
+            RefreshToken(
+                token_hash=hash_token(resp_data.refresh_token),
+                family_id=family_id or secrets.token_hex(16),
+                user_id=user_id,
+                client_id=oauth_app.client_id,
+                scope=scope,
+                expires_at=now
+                + timedelta(seconds=identity_app_settings.refresh_token_ttl),
+            )
+        )
+    return resp_data, rows
+
+
+async def exchange_code(
+    oauth_app: ClientRecord, code: str, redirect_uri: str
+) -> TokenResponse:
+    code_obj = await code_store.consume(code)
+
+    if not code_obj:
+        raise HTTPException(status_code=404, detail="Invalid code")
+    if code_obj.client_id != oauth_app.client_id:
+        raise HTTPException(status_code=403, detail="Invalid client_id")
+    if code_obj.redirect_uri != redirect_uri:
+        raise HTTPException(status_code=403, detail="Invalid redirect_uri")
+
+    resp_data, rows = mint_tokens(oauth_app, code_obj.user_id, code_obj.scope)
+    if rows:
+        async with write_session() as db_session:
+            db_session.add_all(rows)
+            await db_session.commit()
+
+    if "openid" in code_obj.scope.split(" "):
+        resp_data.id_token = mint_id_token(code_obj)
+    return resp_data
+
+
+async def exchange_refresh_token(
+    oauth_app: ClientRecord, refresh_token: str
+) -> TokenResponse:
+    """Rotate a refresh token: mark it used and mint a new one in its family.
+
+    Presenting a refresh token that was already used means it was stolen, or the
+    legitimate client lost a race to whoever stole it; either way the whole
+    family is revoked and the user has to log in again.
+    """
+    token_hash = hash_token(refresh_token)
+    now = datetime.now(UTC)
+    stmt = (
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.client_id == oauth_app.client_id,
+            RefreshToken.used_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(used_at=now)
+        .returning(RefreshToken.family_id, RefreshToken.user_id, RefreshToken.scope)
+    )
+    async with write_session() as db_session:
+        grant = (
+            await db_session.execute(
+                stmt, execution_options={"synchronize_session": False}
+            )
+        ).one_or_none()
+
+        if grant is None:
+            reused_family = await db_session.scalar(
+                select(RefreshToken.family_id).where(
+                    RefreshToken.token_hash == token_hash,
+                    RefreshToken.client_id == oauth_app.client_id,
+                    RefreshToken.used_at.is_not(None),
+                )
+            )
+            if reused_family is not None:
+                logger.warning("Refresh token reused, revoking its family")
+                await db_session.execute(
+                    delete(RefreshToken).where(RefreshToken.family_id == reused_family)
+                )
+                await db_session.commit()
+            raise HTTPException(status_code=404, detail="Invalid refresh_token")
+
+        resp_data, rows = mint_tokens(
+            oauth_app, grant.user_id, grant.scope, grant.family_id
+        )
+        db_session.add_all(rows)
+        await db_session.commit()
+    return resp_data
+
+
+async def grant_client_credentials(
+    oauth_app: ClientRecord, scope: str | None
+) -> TokenResponse:
+    # OpenID Connect scopes are about a user, and there is none here
+    allowed = set(oauth_app.allowed_scopes.split()) - {"openid"}
+    requested = allowed if scope is None else set(scope.split())
+    if not requested <= allowed:
+        raise HTTPException(status_code=403, detail="Invalid scope")
+
+    resp_data, rows = mint_tokens(oauth_app, None, " ".join(sorted(requested)))
+    if rows:
+        async with write_session() as db_session:
+            db_session.add_all(rows)
+            await db_session.commit()
+    return resp_data
+
+
 class GrantTypes(StrEnum):
     AUTHORIZATION_CODE = "authorization_code"
+    REFRESH_TOKEN = "refresh_token"  # noqa: S105
+    CLIENT_CREDENTIALS = "client_credentials"
 
 
 @app.post(
@@ -246,47 +597,169 @@ class GrantTypes(StrEnum):
         200: {"model": TokenResponse},
         403: {"model": ErrorWithDetail},
         404: {"model": ErrorWithDetail},
+        429: {"model": ErrorWithDetail},
     },
 )
 async def token_endpoint(
+    request: Request,
     grant_type: Annotated[GrantTypes, Form()],
-    code: Annotated[str, Form()],
     client_id: Annotated[str, Form()],
     client_secret: Annotated[str, Form()],
-    redirect_uri: Annotated[str, Form()],
-    db_session: Annotated[AsyncSession, Depends(get_db)],
+    code: Annotated[str, Form()] = "",
+    redirect_uri: Annotated[str, Form()] = "",
+    refresh_token: Annotated[str, Form()] = "",
+    scope: Annotated[str | None, Form()] = None,
 ) -> TokenResponse:
+    await rate_limiter.check("token:ip", client_ip(request))
+    oauth_app = await authenticate_client(client_id, client_secret)
+    # Only once authenticated, so that guessing secrets cannot lock a client out
+    await rate_limiter.check("token:client", oauth_app.client_id)
+
     if grant_type == GrantTypes.AUTHORIZATION_CODE:
-        stmt = select(Code).where(Code.code == code)
-        code_result = (await db_session.execute(stmt)).one_or_none()
-        if not code_result:
-            raise HTTPException(status_code=404, detail="Invalid code")
-        code_obj: Code = code_result[0]
-        if code_obj.client_id != client_id:
-            raise HTTPException(status_code=403, detail="Invalid client_id")
-        if code_obj.redirect_uri != redirect_uri:
-            raise HTTPException(status_code=403, detail="Invalid redirect_uri")
-
-        stmt = select(OAuthApp).where(OAuthApp.client_id == client_id)
-        oauth_app_result = (await db_session.execute(stmt)).one_or_none()
-
-        if not oauth_app_result:
-            raise HTTPException(status_code=404, detail="Invalid client_id")
-        oauth_app_obj: OAuthApp = oauth_app_result[0]
-        if oauth_app_obj.client_secret != client_secret:
-            raise HTTPException(status_code=403, detail="Invalid client_secret")
-
-        resp_data = TokenResponse(
-            access_token=code_obj.access_token,
-            scope=code_obj.scope,
-            expires_in=86400,  # 1d
+        return await exchange_code(oauth_app, code, redirect_uri)
+    if grant_type == GrantTypes.REFRESH_TOKEN:
+        return await exchange_refresh_token(oauth_app, refresh_token)
+    if grant_type == GrantTypes.CLIENT_CREDENTIALS:
+        return await grant_client_credentials(oauth_app, scope)
+
+    raise HTTPException(status_code=404, detail="Unsupported grant_type")
+
+
+class UserInfo(BaseModel):
+    sub: str
+    preferred_username: str | None = None
+    name: str | None = None
+    nickname: str | None = None
+    picture: str | None = None
+    website: str | None = None
+    birthdate: date | None = None
+    email: str | None = None
+    phone_number: str | None = None
+
+
+# Claims released per scope, and the only `User` columns loaded for them
+USERINFO_CLAIMS: dict[str, dict[str, InstrumentedAttribute]] = {
+    "profile": {
+        "preferred_username": User.username,
+        "name": User.nickname,
+        "nickname": User.nickname,
+        "picture": User.avatar_url,
+        "website": User.website,
+        "birthdate": User.birth,
+    },
+    "email": {"email": User.email},
+    "phone": {"phone_number": User.phone},
+}
+
+# Rendered userinfo documents per user, one per distinct set of granted scopes
+userinfo_cache: TTLCache[int, dict[frozenset[str], StaticDocument]] = TTLCache(
+    maxsize=identity_app_settings.userinfo_cache_size,
+    ttl=identity_app_settings.userinfo_cache_ttl,
+)
+
+
+register_cache_metrics({
+    "session_token": session_token_cache,
+    "client": client_registry,
+    "userinfo": userinfo_cache,
+})
+
+
+def invalidate_userinfo(user_id: int) -> None:
+    userinfo_cache.pop(user_id)
+
+
+async def find_access_grant(
+    token: str, db_session: AsyncSession
+) -> tuple[str, str] | None:
+    """Resolve an opaque or JWT access token to its subject and scope.
+
+    The subject is the user ID, or the client ID for client credentials tokens.
+    """
+    if token_kind(token) == TokenKind.ACCESS_TOKEN:
+        stmt = select(
+            AccessToken.user_id, AccessToken.client_id, AccessToken.scope
+        ).where(
+            AccessToken.token_hash == hash_token(token),
+            AccessToken.expires_at > datetime.now(UTC),
         )
+        row = (await db_session.execute(stmt)).one_or_none()
+        if row is None:
+            return None
+        subject = row.client_id if row.user_id is None else str(row.user_id)
+        return subject, row.scope
+
+    try:
+        claims = verify_jwt_access_token(token)
+    except jwt.InvalidTokenError:
+        return None
+    return claims["sub"], claims["scope"]
 
-        if "openid" in code_obj.scope.split(" "):
-            resp_data.id_token = code_obj.id_token
-        return resp_data
 
-    raise HTTPException(status_code=404, detail="Unsupported grant_type")
+def bearer_error(status_code: int, error: str) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail="Invalid token" if error == "invalid_token" else "Insufficient scope",
+        headers={"WWW-Authenticate": f'Bearer error="{error}"'},
+    )
+
+
+@app.api_route(
+    "/api/userinfo",
+    methods=["GET", "POST"],
+    response_model=UserInfo,
+    responses={
+        200: {"model": UserInfo},
+        304: {"description": "Not Modified"},
+        401: {"model": ErrorWithDetail},
+        403: {"model": ErrorWithDetail},
+    },
+)
+async def userinfo(
+    request: Request,
+    db_session: Annotated[AsyncSession, Depends(get_read_db)],
+) -> Response:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise bearer_error(401, "invalid_token")
+
+    grant = await find_access_grant(token, db_session)
+    if not grant:
+        raise bearer_error(401, "invalid_token")
+    subject, scope = grant
+
+    # Client credentials tokens never carry openid, so the subject is a user
+    scopes = frozenset(scope.split(" "))
+    if "openid" not in scopes:
+        raise bearer_error(403, "insufficient_scope")
+    user_id = int(subject)
+
+    documents = userinfo_cache.get(user_id)
+    if documents is None:
+        documents = {}
+        userinfo_cache.set(user_id, documents)
+    document = documents.get(scopes)
+    if document is None:
+        columns = {
+            claim: column
+            for scope in sorted(scopes)
+            for claim, column in USERINFO_CLAIMS.get(scope, {}).items()
+        }
+        claims = {}
+        if columns:
+            stmt = select(*columns.values()).where(User.id == user_id)
+            user_row = (await db_session.execute(stmt)).one_or_none()
+            if not user_row:
+                raise bearer_error(401, "invalid_token")
+            claims = dict(zip(columns, user_row, strict=True))
+
+        info = UserInfo(sub=str(user_id), **claims)
+        document = StaticDocument.from_bytes(
+            info.model_dump_json(exclude_none=True).encode()
+        )
+        documents[scopes] = document
+
+    return document.response(request, "private, no-cache")
 
 
 # TODO @cxzlw: Data validation
@@ -294,7 +767,7 @@ async def token_endpoint(
 
 
 class RegisterReq(BaseModel):
-    username: str
+    username: str = Field(pattern=r"^[^@]+$")  # '@' marks an email at login
     password: str
     email: str
     nickname: str
@@ -319,6 +792,101 @@ class TokenPayload(BaseModel):
 
 class AuthTokenPayload(TokenPayload):
     user_id: int
+    jti: str | None = None  # Absent from tokens issued before revocation
+
+
+class IDTokenPayload(TokenPayload):
+    sub: str
+    auth_time: int
+    nonce: str | None = None
+    user_id: int  # Kept for relying parties that predate `sub`
+
+
+class AccessTokenPayload(TokenPayload):
+    """Claims of JWT access tokens, after RFC 9068."""
+
+    sub: str
+    client_id: str
+    scope: str
+    jti: str
+
+
+JWT_ACCESS_TOKEN_TYPE = "at+jwt"  # noqa: S105
+
+
+def mint_jwt_access_token(user_id: int | None, client_id: str, scope: str) -> str:
+    now = datetime.now(UTC)
+    payload = AccessTokenPayload(
+        iss=identity_app_settings.issuer,
+        # Tokens a client gets for itself name the client as their subject
+        sub=client_id if user_id is None else str(user_id),
+        aud=[client_id],
+        iat=now,
+        exp=now + timedelta(seconds=identity_app_settings.jwt_access_token_ttl),
+        client_id=client_id,
+        scope=scope,
+        jti=secrets.token_urlsafe(16),
+    )
+    return keyring.sign(
+        payload.model_dump(exclude_none=True),
+        headers={"typ": JWT_ACCESS_TOKEN_TYPE},
+    )
+
+
+def verify_jwt_access_token(token: str, **kwargs: Any) -> dict[str, Any]:  # noqa: ANN401
+    """Verify a JWT access token, including that it was not revoked.
+
+    Raises:
+        jwt.InvalidTokenError: The token is invalid, expired, revoked, or not an
+            access token.
+
+    """
+    # Session and ID tokens are signed with the same keys; only accept tokens
+    # typed as access tokens
+    if jwt.get_unverified_header(token).get("typ") != JWT_ACCESS_TOKEN_TYPE:
+        raise jwt.InvalidTokenError("Not an access token")  # noqa: TRY003
+    claims = keyring.verify(
+        token,
+        issuer=identity_app_settings.issuer,
+        options={
+            "require": ["exp", "sub", "scope", "jti"],
+            "verify_aud": False,
+            **kwargs.pop("options", {}),
+        },
+        **kwargs,
+    )
+    if revocations.is_revoked(claims["jti"]):
+        raise jwt.InvalidTokenError("Token revoked")  # noqa: TRY003
+    return claims
+
+
+def mint_id_token(code_obj: AuthorizationCode) -> str:
+    now = datetime.now(UTC)
+    payload = IDTokenPayload(
+        iss=identity_app_settings.issuer,
+        sub=str(code_obj.user_id),
+        aud=[code_obj.client_id],
+        iat=now,
+        exp=now + timedelta(seconds=identity_app_settings.id_token_ttl),
+        auth_time=int(code_obj.auth_time.timestamp()),
+        nonce=code_obj.nonce,
+        user_id=code_obj.user_id,
+    )
+    return keyring.sign(payload.model_dump(exclude_none=True))
+
+
+async def find_taken_credential(username: str, email: str) -> str | None:
+    stmt = select(
+        exists().where(User.username == username),
+        exists().where(User.email == email),
+    )
+    async with read_session_maker() as db_session:
+        username_taken, email_taken = (await db_session.execute(stmt)).one()
+    if username_taken:
+        return "Username exists"
+    if email_taken:
+        return "Email exists"
+    return None
 
 
 @app.post(
@@ -328,89 +896,127 @@ class AuthTokenPayload(TokenPayload):
         200: {"model": AuthTokenResponse},
         403: {"model": ErrorWithDetail},
         409: {"model": ErrorWithDetail},
+        429: {"model": ErrorWithDetail},
+        503: {"model": ErrorWithDetail},
     },
 )
 async def register(
     register_req: RegisterReq,
+    request: Request,
     response: Response,
-    db_session: Annotated[AsyncSession, Depends(get_db)],
 ) -> AuthTokenResponse:
-    # Check if username exists
-    stmt = select(1).where(User.username == register_req.username)
-    result = (await db_session.execute(stmt)).scalar()
-    if result:
-        raise HTTPException(status_code=409, detail="Username exists")
-
-    # Check if email exists
-    stmt = select(1).where(User.email == register_req.email)
-    result = (await db_session.execute(stmt)).scalar()
-    if result:
-        raise HTTPException(status_code=409, detail="Email exists")
-
-    hashed_password = hasher.hash(register_req.password)
-
-    new_user = User(
-        username=register_req.username,
-        email=register_req.email,
-        nickname=register_req.nickname,
-        hashed_password=hashed_password,
-        joined_at=datetime.now(tz=tz),
+    await rate_limiter.check("register:ip", client_ip(request))
+
+    # Cheap pre-check so that obvious duplicates don't cost an Argon2 hash
+    if detail := await find_taken_credential(register_req.username, register_req.email):
+        raise HTTPException(status_code=409, detail=detail)
+
+    hashed_password = await hashing_service.hash(register_req.password)
+
+    # The unique indexes are the actual guard against concurrent registrations
+    stmt = (
+        insert(User)
+        .values(
+            username=register_req.username,
+            email=register_req.email,
+            nickname=register_req.nickname,
+            hashed_password=hashed_password,
+            joined_at=datetime.now(tz=tz),
+        )
+        .returning(User.id)
     )
-
-    db_session.add(new_user)
-    await db_session.flush()
+    try:
+        async with write_session() as write_db_session:
+            user_id = (await write_db_session.execute(stmt)).scalar_one()
+            await write_db_session.commit()
+    except IntegrityError:
+        detail = await find_taken_credential(register_req.username, register_req.email)
+        raise HTTPException(
+            status_code=409, detail=detail or "Username exists"
+        ) from None
 
     now = datetime.now(tz=tz)
 
     token_payload = AuthTokenPayload(
-        user_id=new_user.id,
+        user_id=user_id,
         iss=identity_app_settings.issuer,
         iat=now,
         nbf=now,
         exp=now + timedelta(days=7),
+        jti=secrets.token_urlsafe(16),
     )
 
-    await (
-        db_session.commit()
-    )  # Commit as soon as possible to avoid conflicts and rollback
-
-    token = jwt.encode(
-        token_payload.model_dump(),
-        key=identity_app_settings.rsa_pri_key,
-        algorithm="RS256",
-        headers={"kid": "main"},
-    )
+    token = keyring.sign(token_payload.model_dump())
 
     response.set_cookie("token", token)
     return AuthTokenResponse(token=token)
 
 
+async def rehash_password(user_id: int, old_hash: str, password: str) -> None:
+    """Store a hash made with the current Argon2 parameters.
+
+    Runs after the login response is sent. It is skipped when the hashing pool is
+    busy, and the next login tries again.
+    """
+    try:
+        new_hash = await hashing_service.hash(password)
+    except HashingBusyError:
+        return
+    async with write_session() as db_session:
+        # Unless the password was changed meanwhile
+        await db_session.execute(
+            update(User)
+            .where(User.id == user_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash),
+            execution_options={"synchronize_session": False},
+        )
+        await db_session.commit()
+
+
 @app.post(
     "/api/login",
     response_model=AuthTokenResponse,
     responses={
         200: {"model": AuthTokenResponse},
         401: {"model": ErrorWithDetail},
+        429: {"model": ErrorWithDetail},
+        503: {"model": ErrorWithDetail},
     },
 )
 async def login(
     login_req: LoginReq,
+    request: Request,
     response: Response,
-    db_session: Annotated[AsyncSession, Depends(get_db)],
+    db_session: Annotated[AsyncSession, Depends(get_read_db)],
+    background_tasks: BackgroundTasks,
 ) -> AuthTokenResponse:
-    stmt = select(User).where(
-        (User.username == login_req.login) | (User.email == login_req.login)
-    )
+    ip = client_ip(request)
+    await rate_limiter.check("login:ip", ip)
+
+    # Pick the indexed column from the shape of the input instead of an OR predicate
+    column = User.email if "@" in login_req.login else User.username
+    stmt = select(User).where(column == login_req.login)
     result = (await db_session.execute(stmt)).scalar()
 
     if not result:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    # Keyed by user ID, whichever login form was used, and by IP, so that
+    # guessing from elsewhere cannot lock the user out; only failures count
+    account_key = f"{ip}:{result.id}"
+    await rate_limiter.ensure_allowed("login:account", account_key)
     try:
-        hasher.verify(result.hashed_password, login_req.password)
-    except VerifyMismatchError:
+        await hashing_service.verify(result.hashed_password, login_req.password)
+    except (VerificationError, InvalidHashError):
+        # Includes mismatches, and stored hashes that cannot be checked at all
+        await rate_limiter.record("login:account", account_key)
         raise HTTPException(status_code=401, detail="Invalid credentials") from None
 
+    if hashing_service.hasher.check_needs_rehash(result.hashed_password):
+        background_tasks.add_task(
+            rehash_password, result.id, result.hashed_password, login_req.password
+        )
+
     now = datetime.now(tz=tz)
 
     token_payload = AuthTokenPayload(
@@ -419,14 +1025,181 @@ async def login(
         iat=now,
         nbf=now,
         exp=now + timedelta(days=7),
+        jti=secrets.token_urlsafe(16),
     )
 
-    token = jwt.encode(
-        token_payload.model_dump(),
-        key=identity_app_settings.rsa_pri_key,
-        algorithm="RS256",
-        headers={"kid": "main"},
-    )
+    token = keyring.sign(token_payload.model_dump())
 
     response.set_cookie("token", token)
     return AuthTokenResponse(token=token)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    body = await render_metrics()
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def revoke_session_token(token: str) -> None:
+    try:
+        claims = verify_session_token(token)
+    except jwt.InvalidTokenError:
+        return  # Invalid, expired or already revoked
+    invalidate_session_token(token)
+    if "jti" in claims and "exp" in claims:
+        await revocations.revoke(
+            claims["jti"], datetime.fromtimestamp(claims["exp"], tz=UTC)
+        )
+
+
+@app.post("/api/logout", status_code=204, response_class=Response)
+async def logout(request: Request) -> Response:
+    if "token" in request.cookies:
+        await revoke_session_token(request.cookies["token"])
+
+    response = Response(status_code=204)
+    response.delete_cookie("token")
+    return response
+
+
+@app.post(
+    "/api/revoke",
+    response_class=Response,
+    responses={
+        200: {"description": "Revoked, or nothing to revoke"},
+        403: {"model": ErrorWithDetail},
+        404: {"model": ErrorWithDetail},
+        429: {"model": ErrorWithDetail},
+    },
+)
+async def revoke(
+    request: Request,
+    token: Annotated[str, Form()],
+    client_id: Annotated[str | None, Form()] = None,
+    client_secret: Annotated[str | None, Form()] = None,
+) -> Response:
+    """Revoke a token (RFC 7009).
+
+    Access and refresh tokens can only be revoked by the client they were issued
+    to, which must authenticate. Session tokens can be revoked by anyone holding them.
+    Unknown, invalid and expired tokens are ignored.
+    """
+    await rate_limiter.check("token:ip", client_ip(request))
+    client = None
+    if client_id is not None:
+        client = await authenticate_client(client_id, client_secret or "")
+        await rate_limiter.check("token:client", client.client_id)
+
+    if token_kind(token) == TokenKind.ACCESS_TOKEN:
+        if client is not None:
+            async with write_session() as db_session:
+                await db_session.execute(
+                    delete(AccessToken).where(
+                        AccessToken.token_hash == hash_token(token),
+                        AccessToken.client_id == client.client_id,
+                    )
+                )
+                await db_session.commit()
+        return Response(status_code=200)
+
+    if token_kind(token) == TokenKind.REFRESH_TOKEN:
+        if client is not None:
+            # Revoke the whole family, including tokens rotated out of this one
+            family = (
+                select(RefreshToken.family_id)
+                .where(
+                    RefreshToken.token_hash == hash_token(token),
+                    RefreshToken.client_id == client.client_id,
+                )
+                .scalar_subquery()
+            )
+            async with write_session() as db_session:
+                await db_session.execute(
+                    delete(RefreshToken).where(RefreshToken.family_id == family)
+                )
+                await db_session.commit()
+        return Response(status_code=200)
+
+    try:
+        claims = verify_jwt_access_token(token)
+    except jwt.InvalidTokenError:
+        await revoke_session_token(token)
+        return Response(status_code=200)
+
+    if client is not None and claims.get("client_id") == client.client_id:
+        await revocations.revoke(
+            claims["jti"], datetime.fromtimestamp(claims["exp"], tz=UTC)
+        )
+    return Response(status_code=200)
+
+
+class IntrospectionResponse(BaseModel):
+    active: bool
+    scope: str | None = None
+    client_id: str | None = None
+    sub: str | None = None
+    exp: int | None = None
+    iat: int | None = None
+    jti: str | None = None
+    token_type: str | None = None
+
+
+@app.post(
+    "/api/introspect",
+    response_model=IntrospectionResponse,
+    response_model_exclude_none=True,
+    responses={
+        200: {"model": IntrospectionResponse},
+        403: {"model": ErrorWithDetail},
+        404: {"model": ErrorWithDetail},
+        429: {"model": ErrorWithDetail},
+    },
+)
+async def introspect(
+    request: Request,
+    token: Annotated[str, Form()],
+    client_id: Annotated[str, Form()],
+    client_secret: Annotated[str, Form()],
+    db_session: Annotated[AsyncSession, Depends(get_read_db)],
+) -> IntrospectionResponse:
+    """Tell an authenticated client whether an access token is active (RFC 7662)."""
+    await rate_limiter.check("token:ip", client_ip(request))
+    client = await authenticate_client(client_id, client_secret)
+    await rate_limiter.check("token:client", client.client_id)
+
+    if token_kind(token) == TokenKind.ACCESS_TOKEN:
+        stmt = select(
+            AccessToken.user_id,
+            AccessToken.client_id,
+            AccessToken.scope,
+            AccessToken.expires_at,
+        ).where(
+            AccessToken.token_hash == hash_token(token),
+            AccessToken.expires_at > datetime.now(UTC),
+        )
+        row = (await db_session.execute(stmt)).one_or_none()
+        if row is None:
+            return IntrospectionResponse(active=False)
+        return IntrospectionResponse(
+            active=True,
+            scope=row.scope,
+            client_id=row.client_id,
+            sub=row.client_id if row.user_id is None else str(row.user_id),
+            exp=int(row.expires_at.timestamp()),
+            token_type="Bearer",  # noqa: S106
+        )
+
+    try:
+        claims = verify_jwt_access_token(token)
+    except jwt.InvalidTokenError:
+        return IntrospectionResponse(active=False)
+    return IntrospectionResponse(
+        active=True,
+        scope=claims["scope"],
+        client_id=claims.get("client_id"),
+        sub=claims["sub"],
+        exp=claims["exp"],
+        iat=claims.get("iat"),
+        jti=claims["jti"],
+        token_type="Bearer",  # noqa: S106
+    )
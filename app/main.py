@@ -1,3 +1,5 @@
+import asyncio
+import contextlib
 import logging
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
@@ -5,43 +7,22 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 import settings
-from alembic.autogenerate import compare_metadata
-from alembic.migration import MigrationContext
 from app.instance import app as app
-from app.instance import logger
-from db_manager import engine
-from db_models import Base
+from app.instance import (
+    code_store,
+    logger,
+    purge_expired_access_tokens,
+    purge_expired_refresh_tokens,
+    rate_limiter,
+    revocations,
+)
+from app.schema import ensure_db_schema_consistency
+from app.sweeper import sweep_expired
+from db_manager import dispose_engines
 from settings import identity_app_settings
-from utils.log_handler import MyHandler
+from utils.log_handler import MyHandler, SamplingFilter, setup_json_logging
 from utils.servers import ASGIServer, detect_server
 
-
-class SchemaMismatchError(Exception):
-    """DB schema does not match SQLAlchemy models."""
-
-    def __init__(self, diffs: list) -> None:
-        super().__init__(
-            f"{diffs}\n"
-            "❌ Detected database schema differences. Did you forget to run migrations?\n"
-        )
-
-
-async def ensure_db_schema_consistency() -> None:
-    async with engine.connect() as connection:
-        context = await connection.run_sync(
-            MigrationContext.configure,
-            url=identity_app_settings.db_conn_url,
-            dialect_opts={"paramstyle": "named"},
-        )
-
-        diffs = await connection.run_sync(
-            lambda _: compare_metadata(context, Base.metadata)
-        )
-
-    if diffs:
-        raise SchemaMismatchError(diffs)
-
-
 inner_lifespan = app.router.lifespan_context
 
 
@@ -51,29 +32,56 @@ async def main_lifespan(application: FastAPI) -> AsyncGenerator:
     #     await conn.run_sync(Base.metadata.create_all)
     await ensure_db_schema_consistency()
 
-    async with inner_lifespan(application):
-        yield
+    sweeper = asyncio.create_task(
+        sweep_expired(
+            {
+                "authorization codes": code_store.purge_expired,
+                "access tokens": purge_expired_access_tokens,
+                "refresh tokens": purge_expired_refresh_tokens,
+                "revoked tokens": revocations.purge_expired,
+                "rate limit counters": rate_limiter.store.purge_expired,
+            },
+            identity_app_settings.sweep_interval,
+            identity_app_settings.sweep_batch_size,
+        )
+    )
+    try:
+        async with inner_lifespan(application):
+            yield
+    finally:
+        sweeper.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await sweeper
+        await dispose_engines()
 
 
 app.router.lifespan_context = main_lifespan
 
 
-webserver = detect_server()
-
-if webserver == ASGIServer.UVICORN:
+if detect_server() == ASGIServer.UVICORN:
     uvicorn_logger = logging.getLogger("uvicorn")
     uvicorn_access_logger = logging.getLogger("uvicorn.access")
     uvicorn_logger.handlers = uvicorn_access_logger.handlers = []
     uvicorn_logger.propagate = uvicorn_access_logger.propagate = True
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    datefmt="[%x %X]",
-    format="{message}",
-    style="{",
-    handlers=[MyHandler()],
-)
+if identity_app_settings.log_format == "json" or (
+    identity_app_settings.log_format == "auto" and identity_app_settings.is_prod
+):
+    setup_json_logging(identity_app_settings.log_level)
+else:
+    logging.basicConfig(
+        level=identity_app_settings.log_level,
+        datefmt="[%x %X]",
+        format="{message}",
+        style="{",
+        handlers=[MyHandler()],
+    )
+
+if identity_app_settings.access_log_sample_rate < 1:
+    logging.getLogger("uvicorn.access").addFilter(
+        SamplingFilter(identity_app_settings.access_log_sample_rate)
+    )
 
 if not identity_app_settings.is_prod:
     logger.warning("App is running in development mode.")
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import event
+
+import db_manager
+from settings import identity_app_settings
+from utils.metrics import (
+    Counter,
+    CounterFunc,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    read_snapshots,
+    write_snapshot,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping
+
+    from sqlalchemy.ext.asyncio import AsyncEngine
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+    from app.clients import ClientRegistry
+    from utils.caches import TTLCache
+    from utils.hashing import PasswordHashingService
+
+logger = logging.getLogger(__name__)
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route template, method and status.",
+        ("route", "method", "status"),
+    )
+)
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time to handle HTTP requests, by route template and method.",
+        ("route", "method"),
+    )
+)
+db_statement_duration = registry.register(
+    Histogram(
+        "db_statement_duration_seconds",
+        "Time spent executing SQL statements, by engine and statement kind.",
+        ("engine", "statement"),
+    )
+)
+db_connection_checkout_duration = registry.register(
+    Histogram(
+        "db_connection_checkout_seconds",
+        "Time connections stay checked out of the pool, by engine.",
+        ("engine",),
+    )
+)
+db_write_lock_wait = registry.register(
+    Histogram(
+        "db_write_lock_wait_seconds",
+        "Time write sessions waited for the SQLite write lock.",
+    )
+)
+crypto_duration = registry.register(
+    Histogram(
+        "crypto_operation_duration_seconds",
+        "Time of Argon2 and JWT operations; Argon2 includes time queued in the pool.",
+        ("operation",),
+    )
+)
+
+STATEMENT_KINDS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE"})
+
+
+def observe_argon2(operation: str, seconds: float) -> None:
+    crypto_duration.observe(seconds, "argon2_" + operation)
+
+
+def observe_jwt(operation: str, seconds: float) -> None:
+    crypto_duration.observe(seconds, "jwt_" + operation)
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Time statements and connection checkouts of `engine` with SQLAlchemy events."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn: Any, *_: Any) -> None:  # noqa: ANN401
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn: Any, _cursor: Any, statement: str, *_: Any) -> None:  # noqa: ANN401
+        elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+        kind = statement.lstrip()[:6].upper()
+        db_statement_duration.observe(
+            elapsed, name, kind if kind in STATEMENT_KINDS else "OTHER"
+        )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context: Any) -> None:  # noqa: ANN401
+        if context.connection is not None:
+            started = context.connection.info.get("statement_started")
+            if started:
+                started.pop()
+
+    @event.listens_for(sync_engine, "checkout")
+    def checkout(_dbapi_conn: Any, record: Any, _proxy: Any) -> None:  # noqa: ANN401
+        record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "checkin")
+    def checkin(_dbapi_conn: Any, record: Any) -> None:  # noqa: ANN401
+        checked_out_at = record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            db_connection_checkout_duration.observe(
+                time.perf_counter() - checked_out_at, name
+            )
+
+
+def pool_stats() -> Iterable[tuple[tuple[str, ...], float]]:
+    engines = {"writer": db_manager.engine, "reader": db_manager.read_engine}
+    for name, engine in engines.items():
+        if name == "reader" and engine is db_manager.engine:
+            continue
+        pool: Any = engine.pool
+        for state, method in [
+            ("size", "size"),
+            ("checked_out", "checkedout"),
+            ("overflow", "overflow"),
+        ]:
+            if hasattr(pool, method):
+                yield (name, state), getattr(pool, method)()
+
+
+registry.register(
+    Gauge(
+        "db_pool_connections",
+        "Connection pool size, checked out connections and overflow, by engine.",
+        ("engine", "state"),
+        pool_stats,
+    )
+)
+
+
+def register_hashing_metrics(hashing_service: PasswordHashingService) -> None:
+    def hashing_stats() -> Iterable[tuple[tuple[str, ...], float]]:
+        stats = hashing_service.stats()
+        yield ("in_flight",), stats.in_flight
+        yield ("queued",), stats.queue_depth
+
+    registry.register(
+        Gauge(
+            "argon2_pool_jobs",
+            "Argon2 jobs running in and queued for the hashing pool.",
+            ("state",),
+            hashing_stats,
+        )
+    )
+    registry.register(
+        CounterFunc(
+            "argon2_pool_rejected_total",
+            "Argon2 jobs rejected because the hashing pool was saturated.",
+            (),
+            lambda: [((), hashing_service.stats().rejected)],
+        )
+    )
+
+
+def register_cache_metrics(caches: Mapping[str, TTLCache | ClientRegistry]) -> None:
+    """Publish the hit and miss totals of in-process caches, by cache name."""
+    registry.register(
+        CounterFunc(
+            "cache_hits_total",
+            "Lookups answered from an in-process cache, by cache.",
+            ("cache",),
+            lambda: [((name,), cache.hits) for name, cache in caches.items()],
+        )
+    )
+    registry.register(
+        CounterFunc(
+            "cache_misses_total",
+            "Lookups an in-process cache could not answer, by cache.",
+            ("cache",),
+            lambda: [((name,), cache.misses) for name, cache in caches.items()],
+        )
+    )
+
+
+instrument_engine(db_manager.engine, "writer")
+if db_manager.read_engine is not db_manager.engine:
+    instrument_engine(db_manager.read_engine, "reader")
+db_manager.write_lock_observers.append(db_write_lock_wait.observe)
+
+
+class MetricsMiddleware:
+    """Count and time every HTTP request by its route template.
+
+    Unmatched paths share one label so that scanners cannot blow up the number
+    of series.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - started, route, method)
+            http_requests.inc(route, method, str(status))
+
+
+def metrics_dir() -> Path | None:
+    if identity_app_settings.metrics_dir is None:
+        return None
+    return Path(identity_app_settings.metrics_dir)
+
+
+def _write_and_render(directory: Path | None, snapshot: dict[str, Any]) -> str:
+    if directory is None:
+        return registry.render([snapshot])
+    write_snapshot(directory, snapshot)
+    return registry.render(read_snapshots(directory))
+
+
+async def render_metrics() -> str:
+    """Render this process's metrics, or every worker's in multi-process mode.
+
+    The snapshot is taken on the event loop, the only thread that updates
+    metrics; file I/O and rendering run in a thread.
+    """
+    return await asyncio.to_thread(
+        _write_and_render, metrics_dir(), registry.snapshot()
+    )
+
+
+async def flush_metrics(interval: float) -> None:
+    """Keep this worker's snapshot in the metrics directory fresh until cancelled."""
+    directory = metrics_dir()
+    if directory is None:
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        while True:
+            try:
+                await asyncio.to_thread(write_snapshot, directory, registry.snapshot())
+            except OSError:
+                logger.exception("Failed to write metrics to %s", directory)
+            await asyncio.sleep(interval)
+    finally:
+        write_snapshot(directory, registry.snapshot())
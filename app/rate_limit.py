@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import math
+import time
+from abc import ABC, abstractmethod
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Literal
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.sweeper import purge_expired_rows
+from db_models import RateLimitCounter
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from db_manager import SessionFactory
+
+
+class RateLimitedError(Exception):
+    """A client went over one of its rate limits."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Rate limit exceeded")
+        self.retry_after = retry_after
+
+
+def sliding_window_wait(
+    previous: int, current: int, elapsed: float, limit: int, window: float
+) -> float:
+    """Seconds to wait before one more hit fits in a sliding window.
+
+    The number of hits over the last `window` seconds is estimated from the count
+    of the current fixed window plus the count of the previous one, weighted by
+    how much of it the sliding window still covers.
+
+    Args:
+        previous (int): The hits counted in the previous fixed window.
+        current (int): The hits counted in the current fixed window so far.
+        elapsed (float): How far into the current window we are, from 0 to 1.
+        limit (int): The hits allowed per window.
+        window (float): The length of the window in seconds.
+
+    Returns:
+        float: 0 if a hit is allowed now, else the seconds until it would be.
+
+    """
+    if previous * (1 - elapsed) + current < limit:
+        return 0
+    if current < limit:
+        # Wait for enough of the previous window to slide out
+        return window * (1 - elapsed - (limit - current) / previous)
+    # Wait for the next window, then for enough of this one to slide out
+    return window * (1 - elapsed) + window * (1 - limit / current)
+
+
+class RateLimitStore(ABC):
+    """Where the hit counters of rate-limited keys live."""
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int) -> float:
+        """Count a hit on `key` unless it would go over `limit` per window.
+
+        Returns:
+            float: 0 if the hit was counted, else the seconds to wait. Rejected
+                hits are not counted.
+
+        """
+
+    @abstractmethod
+    async def wait(self, key: str, limit: int) -> float:
+        """Tell how long until a hit on `key` would be counted, without counting one.
+
+        Returns:
+            float: 0 if a hit would be counted now, else the seconds to wait.
+
+        """
+
+    @abstractmethod
+    async def purge_expired(self, batch_size: int) -> int:
+        """Drop counters too old to matter, at most `batch_size` at a time.
+
+        Returns:
+            int: The number of counters dropped.
+
+        """
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Counters kept in process memory, one small list per key.
+
+    Each worker counts on its own, so with N workers a client gets up to N times
+    the limit; use the SQL store to share counters.
+    """
+
+    def __init__(self, window: float) -> None:
+        super().__init__(window)
+        # key -> [window index, hits in that window, hits in the window before]
+        self._buckets: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _bucket(self, key: str, index: int) -> list[int] | None:
+        # Roll the bucket of `key` over to the window `index`
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            if bucket[0] < index - 1:
+                bucket[:] = [index, 0, 0]
+            elif bucket[0] == index - 1:
+                bucket[:] = [index, 0, bucket[1]]
+        return bucket
+
+    async def hit(self, key: str, limit: int) -> float:
+        position = time.time() / self.window
+        index = int(position)
+        bucket = self._bucket(key, index)
+        if bucket is None:
+            bucket = self._buckets[key] = [index, 0, 0]
+
+        wait = sliding_window_wait(
+            bucket[2], bucket[1], position - index, limit, self.window
+        )
+        if not wait:
+            bucket[1] += 1
+        return wait
+
+    async def wait(self, key: str, limit: int) -> float:
+        position = time.time() / self.window
+        index = int(position)
+        bucket = self._bucket(key, index)
+        if bucket is None:
+            return 0
+        return sliding_window_wait(
+            bucket[2], bucket[1], position - index, limit, self.window
+        )
+
+    async def purge_expired(self, batch_size: int) -> int:
+        index = int(time.time() / self.window)
+        expired = [
+            key for key, bucket in self._buckets.items() if bucket[0] < index - 1
+        ]
+        for purged, key in enumerate(expired, start=1):
+            self._buckets.pop(key, None)
+            if purged % batch_size == 0:
+                await asyncio.sleep(0)
+        return len(expired)
+
+
+def _counter_key(key: str, index: int) -> str:
+    return f"{key}@{index}"
+
+
+async def _read_counts(db_session: AsyncSession, key: str, index: int) -> list[int]:
+    # The hits on `key` in the window `index` and in the one before
+    keys = [_counter_key(key, index), _counter_key(key, index - 1)]
+    result = await db_session.execute(
+        select(RateLimitCounter.key, RateLimitCounter.count).where(
+            RateLimitCounter.key.in_(keys)
+        )
+    )
+    counts = dict(result.tuples().all())
+    return [counts.get(k, 0) for k in keys]
+
+
+class SQLRateLimitStore(RateLimitStore):
+    """Counters in the `rate_limit_counters` table, shared by all workers.
+
+    Every hit costs a read and a write, so only use this where limits must hold
+    across workers.
+    """
+
+    def __init__(self, window: float, session_factory: SessionFactory) -> None:
+        super().__init__(window)
+        self._session_factory = session_factory
+
+    async def hit(self, key: str, limit: int) -> float:
+        position = time.time() / self.window
+        index = int(position)
+        current_key = _counter_key(key, index)
+
+        async with self._session_factory() as db_session:
+            current, previous = await _read_counts(db_session, key, index)
+            wait = sliding_window_wait(
+                previous, current, position - index, limit, self.window
+            )
+            if wait:
+                return wait
+
+            if current:
+                await db_session.execute(
+                    update(RateLimitCounter)
+                    .where(RateLimitCounter.key == current_key)
+                    .values(count=RateLimitCounter.count + 1),
+                    execution_options={"synchronize_session": False},
+                )
+            else:
+                # Kept through the next window, which still looks back at it
+                expires_at = datetime.fromtimestamp((index + 2) * self.window, tz=UTC)
+                db_session.add(
+                    RateLimitCounter(key=current_key, count=1, expires_at=expires_at)
+                )
+            # Another worker may have created the counter meanwhile; its hit counts
+            with contextlib.suppress(IntegrityError):
+                await db_session.commit()
+        return 0
+
+    async def wait(self, key: str, limit: int) -> float:
+        position = time.time() / self.window
+        index = int(position)
+        async with self._session_factory() as db_session:
+            current, previous = await _read_counts(db_session, key, index)
+        return sliding_window_wait(
+            previous, current, position - index, limit, self.window
+        )
+
+    async def purge_expired(self, batch_size: int) -> int:
+        return await purge_expired_rows(
+            self._session_factory,
+            RateLimitCounter,
+            RateLimitCounter.key,
+            RateLimitCounter.expires_at,
+            batch_size,
+        )
+
+
+def create_rate_limit_store(
+    backend: Literal["memory", "sql"],
+    window: float,
+    session_factory: SessionFactory,
+) -> RateLimitStore:
+    if backend == "sql":
+        return SQLRateLimitStore(window, session_factory)
+    return MemoryRateLimitStore(window)
+
+
+class RateLimiter:
+    """Named limits, each a number of hits per window of the store.
+
+    Args:
+        store (RateLimitStore): Where hits are counted.
+        limits (Mapping[str, int]): Hits allowed per window, by name, e.g.
+            `login:ip`. A limit of 0 disables it.
+
+    """
+
+    def __init__(self, store: RateLimitStore, limits: Mapping[str, int]) -> None:
+        self.store = store
+        self.limits = dict(limits)
+
+    @staticmethod
+    def _key(name: str, key: str) -> str:
+        # Digested, so that user-supplied keys such as logins have a bounded
+        # length and are not kept in the clear
+        return f"{name}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+    async def check(self, name: str, key: str) -> None:
+        """Count a hit on `key` under the limit `name`.
+
+        Raises:
+            RateLimitedError: The hit goes over the limit.
+
+        """
+        limit = self.limits[name]
+        if not limit:
+            return
+        wait = await self.store.hit(self._key(name, key), limit)
+        if wait:
+            raise RateLimitedError(max(1, math.ceil(wait)))
+
+    async def ensure_allowed(self, name: str, key: str) -> None:
+        """Check the limit `name` for `key` without counting a hit.
+
+        Pair it with `record` for limits that only count failures.
+
+        Raises:
+            RateLimitedError: `key` is over the limit.
+
+        """
+        limit = self.limits[name]
+        if not limit:
+            return
+        wait = await self.store.wait(self._key(name, key), limit)
+        if wait:
+            raise RateLimitedError(max(1, math.ceil(wait)))
+
+    async def record(self, name: str, key: str) -> None:
+        """Count a hit on `key` under the limit `name`, without raising."""
+        limit = self.limits[name]
+        if limit:
+            await self.store.hit(self._key(name, key), limit)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.sweeper import purge_expired_rows
+from db_models import RevokedToken
+from utils.bloom import BloomFilter
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    from db_manager import SessionFactory
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    """The `jti`s of revoked JWTs that have not expired yet, held in memory.
+
+    A Bloom filter answers the common case, a token that was never revoked,
+    without touching the exact map behind it; a filter hit is confirmed against
+    the map of `jti` to expiry. Revocations are written to the `revoked_tokens`
+    table, loaded on startup, and picked up from other workers by `sync`, which
+    also forgets expired entries and rebuilds the filter without them.
+    """
+
+    def __init__(
+        self,
+        write_session: SessionFactory,
+        read_session_maker: async_sessionmaker[AsyncSession],
+        *,
+        capacity: int,
+        error_rate: float,
+    ) -> None:
+        self._write_session = write_session
+        self._read_session_maker = read_session_maker
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._expiry: dict[str, float] = {}
+        self._filter = BloomFilter(capacity, error_rate)
+        self._synced_at: datetime | None = None
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def _add(self, jti: str, expires_at: float) -> None:
+        if jti not in self._expiry:
+            self._filter.add(jti)
+        self._expiry[jti] = expires_at
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti not in self._filter:
+            return False
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    async def revoke(self, jti: str, expires_at: datetime) -> None:
+        """Revoke a JWT in this worker at once, and in the others on their sync."""
+        self._add(jti, expires_at.timestamp())
+        try:
+            async with self._write_session() as db_session:
+                await db_session.execute(
+                    insert(RevokedToken).values(
+                        jti=jti, revoked_at=datetime.now(UTC), expires_at=expires_at
+                    )
+                )
+                await db_session.commit()
+        except IntegrityError:
+            pass  # Already revoked
+
+    def prune(self) -> int:
+        """Forget expired entries and rebuild the filter with the rest.
+
+        Returns:
+            int: The number of entries forgotten.
+
+        """
+        now = time.time()
+        expired = [jti for jti, expires_at in self._expiry.items() if expires_at <= now]
+        for jti in expired:
+            del self._expiry[jti]
+        if expired or self._filter.count > self.capacity:
+            self._filter = BloomFilter(
+                max(self.capacity, 2 * len(self._expiry)), self.error_rate, self._expiry
+            )
+        return len(expired)
+
+    async def sync(self, overlap: float) -> int:
+        """Load revocations made since the last sync, by any worker.
+
+        Args:
+            overlap (float): Seconds to look back past the last sync, to catch
+                rows committed late or written by workers with skewed clocks.
+
+        Returns:
+            int: The number of rows read.
+
+        """
+        started = datetime.now(UTC)
+        stmt = select(RevokedToken.jti, RevokedToken.expires_at).where(
+            RevokedToken.expires_at > started
+        )
+        if self._synced_at is not None:
+            stmt = stmt.where(
+                RevokedToken.revoked_at > self._synced_at - timedelta(seconds=overlap)
+            )
+        async with self._read_session_maker() as db_session:
+            rows = (await db_session.execute(stmt)).all()
+        for jti, expires_at in rows:
+            self._add(jti, expires_at.timestamp())
+        self._synced_at = started
+        self.prune()
+        return len(rows)
+
+    async def run_sync(self, interval: float) -> None:
+        """Call `sync` every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync(overlap=interval)
+            except SQLAlchemyError:
+                logger.exception("Failed to sync revoked tokens")
+
+    async def purge_expired(self, batch_size: int) -> int:
+        return await purge_expired_rows(
+            self._write_session,
+            RevokedToken,
+            RevokedToken.jti,
+            RevokedToken.expires_at,
+            batch_size,
+        )
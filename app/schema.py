@@ -0,0 +1,149 @@
+"""Check that the database schema matches the models.
+
+By default only the Alembic revision stamped in the database is compared with the
+head of `alembic/versions`, which takes a single query. Reflecting the whole
+database and diffing it against the models is thorough but gets slower as tables
+grow; run it on demand with:
+    python -m app.schema
+or on every startup with `SCHEMA_CHECK=full`.
+"""
+
+from __future__ import annotations
+
+import ast
+import asyncio
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from db_manager import dispose_engines, engine
+from db_models import Base
+from settings import identity_app_settings
+
+if TYPE_CHECKING:
+    from sqlalchemy import Connection
+    from sqlalchemy.ext.asyncio import AsyncConnection
+
+VERSIONS_DIR = Path(__file__).resolve().parent.parent / "alembic" / "versions"
+
+
+class SchemaMismatchError(Exception):
+    """DB schema does not match SQLAlchemy models."""
+
+    def __init__(self, diffs: list) -> None:
+        super().__init__(
+            f"{diffs}\n"
+            "❌ Detected database schema differences. Did you forget to run migrations?\n"
+        )
+
+
+def _revision_ids(node: ast.expr | None) -> set[str]:
+    # A string, None, or a tuple of strings for merge migrations
+    if node is None:
+        return set()
+    value = ast.literal_eval(node)
+    if value is None:
+        return set()
+    if isinstance(value, str):
+        return {value}
+    return set(value)
+
+
+def migration_heads(versions_dir: Path = VERSIONS_DIR) -> set[str]:
+    """Read the head revisions of the migration scripts in `versions_dir`.
+
+    The scripts are parsed rather than imported, which avoids loading Alembic.
+
+    Returns:
+        set[str]: The revisions that no other revision builds upon.
+
+    """
+    revisions: set[str] = set()
+    parents: set[str] = set()
+    for path in versions_dir.glob("*.py"):
+        values: dict[str, ast.expr | None] = {}
+        for node in ast.parse(path.read_bytes(), filename=str(path)).body:
+            if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                values[node.target.id] = node.value
+            elif isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+                values[node.targets[0].id] = node.value
+        revisions |= _revision_ids(values.get("revision"))
+        parents |= _revision_ids(values.get("down_revision"))
+    return revisions - parents
+
+
+async def database_revisions(connection: AsyncConnection) -> set[str]:
+    """Read the revisions stamped in the `alembic_version` table."""
+    try:
+        result = await connection.execute(
+            text("SELECT version_num FROM alembic_version")
+        )
+    except (OperationalError, ProgrammingError):
+        # No such table: the database was never migrated
+        return set()
+    return set(result.scalars())
+
+
+def compare_models(connection: Connection) -> list:
+    # Importing autogenerate loads most of Alembic, so only do it when asked to
+    from alembic.autogenerate import compare_metadata  # noqa: PLC0415
+    from alembic.migration import MigrationContext  # noqa: PLC0415
+
+    context = MigrationContext.configure(
+        connection, dialect_opts={"paramstyle": "named"}
+    )
+    return compare_metadata(context, Base.metadata)
+
+
+async def ensure_db_schema_consistency(
+    mode: Literal["revision", "full", "off"] | None = None,
+) -> None:
+    """Raise `SchemaMismatchError` if the database lags behind the models.
+
+    Args:
+        mode (Literal["revision", "full", "off"] | None): "revision" compares the
+            stamped Alembic revision with the head of the migration scripts,
+            "full" reflects the database and compares it with the models, and
+            "off" skips the check. Defaults to the `schema_check` setting.
+
+    """
+    mode = mode or identity_app_settings.schema_check
+    if mode == "off":
+        return
+
+    async with engine.connect() as connection:
+        if mode == "revision":
+            current = await database_revisions(connection)
+            heads = migration_heads()
+            if current != heads:
+                raise SchemaMismatchError([
+                    ("revision", sorted(current), "expected", sorted(heads))
+                ])
+            return
+
+        diffs = await connection.run_sync(compare_models)
+
+    if diffs:
+        raise SchemaMismatchError(diffs)
+
+
+def main() -> None:
+    async def check() -> None:
+        try:
+            await ensure_db_schema_consistency("full")
+        finally:
+            await dispose_engines()
+
+    try:
+        asyncio.run(check())
+    except SchemaMismatchError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print("Database schema matches the models.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Mapping
+
+    from sqlalchemy.orm import InstrumentedAttribute
+
+    from db_manager import SessionFactory
+    from db_models.base import Base
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_expired_rows(
+    session_factory: SessionFactory,
+    model: type[Base],
+    key: InstrumentedAttribute[str],
+    expires_at: InstrumentedAttribute[datetime],
+    batch_size: int,
+) -> int:
+    """Delete rows whose `expires_at` has passed, `batch_size` rows per transaction.
+
+    Each batch commits on its own so the write lock is only held briefly, and the
+    loop yields to the event loop between batches.
+
+    Args:
+        session_factory (SessionFactory): Where to get write sessions.
+        model (type[Base]): The model to delete from.
+        key (InstrumentedAttribute[str]): The primary key column of the table.
+        expires_at (InstrumentedAttribute[datetime]): The expiry column.
+        batch_size (int): The maximum number of rows deleted per transaction.
+
+    Returns:
+        int: The number of rows deleted.
+
+    """
+    total = 0
+    while True:
+        async with session_factory() as db_session:
+            expired = (
+                select(key)
+                .where(expires_at <= datetime.now(UTC))
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            result = await db_session.execute(
+                delete(model).where(key.in_(expired)),
+                execution_options={"synchronize_session": False},
+            )
+            await db_session.commit()
+
+        deleted = result.rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+        await asyncio.sleep(0)
+
+
+async def sweep_expired(
+    purgers: Mapping[str, Callable[[int], Awaitable[int]]],
+    interval: float,
+    batch_size: int,
+) -> None:
+    """Run every purger every `interval` seconds until cancelled.
+
+    Args:
+        purgers (Mapping[str, Callable[[int], Awaitable[int]]]): Purge functions
+            taking a batch size, keyed by what they purge for logging.
+        interval (float): The seconds to wait between sweeps.
+        batch_size (int): Passed to every purger.
+
+    """
+    while True:
+        for name, purge in purgers.items():
+            try:
+                if purged := await purge(batch_size):
+                    logger.info("Purged %d expired %s", purged, name)
+            except SQLAlchemyError:
+                logger.exception("Failed to purge expired %s", name)
+        await asyncio.sleep(interval)
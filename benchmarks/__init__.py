@@ -0,0 +1 @@
+"""Benchmarks for the identity backend. Run them from the repo root."""
@@ -0,0 +1,405 @@
+"""Helpers shared by the benchmarks.
+
+Benchmarks point the app at their own SQLite file through the `DB_CONN_URL`
+environment variable, so `prepare_database` must run before anything imports
+`settings`, `db_manager` or `app`.
+
+Requests go through a `Requester`: either straight into the ASGI app in-process
+(`asgi_requester`) or over HTTP to a running server (`http_requester`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess  # noqa: S404
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlencode, urlsplit
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Iterator
+
+type Requester = Callable[..., Awaitable[tuple[int, bytes]]]
+
+# SQLAlchemy's SQLite storage format for DateTime columns
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def prepare_database(path: Path) -> str:
+    """Create an empty database at `path` and migrate it to head.
+
+    Args:
+        path (Path): The SQLite file to create. Removed first if it exists.
+
+    Returns:
+        str: The SQLAlchemy URL of the database.
+
+    """
+    from alembic import command  # noqa: PLC0415
+    from alembic.config import Config  # noqa: PLC0415
+
+    remove_database(path)
+    url = f"sqlite+aiosqlite:///{path}"
+    os.environ["DB_CONN_URL"] = url
+    command.upgrade(Config("alembic.ini"), "head")
+    return url
+
+
+def remove_database(path: Path) -> None:
+    """Delete the SQLite file at `path` along with its WAL and shared-memory files."""
+    for suffix in ("", "-wal", "-shm"):
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def disable_rate_limits() -> None:
+    """Turn off the rate limits, which a benchmark trips within its first second."""
+    from app.instance import rate_limiter  # noqa: PLC0415
+
+    rate_limiter.limits = dict.fromkeys(rate_limiter.limits, 0)
+
+
+def user_rows(count: int, hashed_password: str, start: int = 0) -> Iterator[tuple]:
+    joined_at = datetime(2025, 1, 1, tzinfo=UTC).strftime(SQLITE_DATETIME_FORMAT)
+    for i in range(start, start + count):
+        yield (
+            f"user{i}",
+            hashed_password,
+            f"user{i}@example.com",
+            True,
+            False,
+            True,
+            False,
+            f"User {i}",
+            joined_at,
+        )
+
+
+def seed_users(
+    path: Path, count: int, hashed_password: str, batch_size: int = 50_000
+) -> None:
+    """Insert `count` deterministic users sharing one password hash."""
+    with sqlite3.connect(path) as conn:
+        for start in range(0, count, batch_size):
+            conn.executemany(
+                "INSERT INTO users (username, hashed_password, email, activated,"
+                " read_only, can_login, shadow_banned, nickname, joined_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                user_rows(min(batch_size, count - start), hashed_password, start),
+            )
+        conn.commit()
+
+
+def client_id(i: int) -> str:
+    return f"client{i}"
+
+
+def client_secret(i: int) -> str:
+    return f"secret{i}"
+
+
+def redirect_uri(i: int) -> str:
+    return f"https://app{i}.example.com/callback"
+
+
+def seed_oauth_apps(path: Path, count: int) -> None:
+    """Insert `count` deterministic OAuth apps, see `client_id`/`client_secret`."""
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO oauth_apps (app_name, app_desc, app_icon_url, client_id,"
+            " client_secret, redirect_uri, allowed_scopes)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    f"App {i}",
+                    f"Benchmark app {i}",
+                    None,
+                    client_id(i),
+                    client_secret(i),
+                    redirect_uri(i),
+                    "openid profile email",
+                )
+                for i in range(count)
+            ),
+        )
+        conn.commit()
+
+
+def code_value(i: int) -> str:
+    return f"code{i:028d}"
+
+
+def seed_codes(
+    path: Path, count: int, users: int, apps: int, batch_size: int = 100_000
+) -> None:
+    """Insert `count` unexpired authorization codes, see `code_value`.
+
+    Code `i` belongs to app `i % apps` and user `i % users + 1`.
+    """
+    now = datetime.now(UTC)
+    created_at = now.strftime(SQLITE_DATETIME_FORMAT)
+    expires_at = (now + timedelta(days=1)).strftime(SQLITE_DATETIME_FORMAT)
+    with sqlite3.connect(path) as conn:
+        for start in range(0, count, batch_size):
+            conn.executemany(
+                "INSERT INTO codes (code, client_id, scope, redirect_uri, user_id,"
+                " nonce, auth_time, created_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        code_value(i),
+                        client_id(i % apps),
+                        "openid profile email",
+                        redirect_uri(i % apps),
+                        i % users + 1,
+                        None,
+                        created_at,
+                        created_at,
+                        expires_at,
+                    )
+                    for i in range(start, min(start + batch_size, count))
+                ),
+            )
+        conn.commit()
+
+
+def encode_request(
+    json_body: Any = None,  # noqa: ANN401
+    form: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+) -> tuple[bytes, dict[str, str]]:
+    all_headers = {"host": "bench.local"}
+    body = b""
+    if json_body is not None:
+        body = json.dumps(json_body).encode()
+        all_headers["content-type"] = "application/json"
+    elif form is not None:
+        body = urlencode(form).encode()
+        all_headers["content-type"] = "application/x-www-form-urlencoded"
+    all_headers["content-length"] = str(len(body))
+    all_headers.update((k.lower(), v) for k, v in (headers or {}).items())
+    return body, all_headers
+
+
+async def asgi_request(
+    app: Callable[..., Awaitable[None]],
+    method: str,
+    path: str,
+    *,
+    json_body: Any = None,  # noqa: ANN401
+    form: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+) -> tuple[int, bytes]:
+    """Send one request straight into an ASGI app, without any HTTP client.
+
+    Returns:
+        tuple[int, bytes]: The status code and the response body.
+
+    """
+    body, all_headers = encode_request(json_body, form, headers)
+    raw_headers = [(k.encode(), v.encode()) for k, v in all_headers.items()]
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench.local", 80),
+    }
+    sent = False
+    status = 0
+    chunks: list[bytes] = []
+
+    async def receive() -> dict[str, Any]:
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+def asgi_requester(app: Callable[..., Awaitable[None]]) -> Requester:
+    async def request(method: str, path: str, **kwargs: Any) -> tuple[int, bytes]:  # noqa: ANN401
+        return await asgi_request(app, method, path, **kwargs)
+
+    return request
+
+
+def http_requester(base_url: str) -> Requester:
+    """Send requests to a running server, one keep-alive connection per thread."""
+    url = urlsplit(base_url)
+    local = threading.local()
+
+    def send(
+        method: str, path: str, body: bytes, headers: dict[str, str]
+    ) -> tuple[int, bytes]:
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(
+                url.hostname or "localhost", url.port or 80, timeout=60
+            )
+        headers["host"] = url.netloc
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            local.conn = None
+            raise
+
+    async def request(
+        method: str,
+        path: str,
+        *,
+        json_body: Any = None,  # noqa: ANN401
+        form: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> tuple[int, bytes]:
+        body, all_headers = encode_request(json_body, form, headers)
+        return await asyncio.to_thread(send, method, path, body, all_headers)
+
+    return request
+
+
+class UnexpectedStatusError(RuntimeError):
+    def __init__(self, path: str, status: int, body: bytes) -> None:
+        super().__init__(f"{path} returned {status}: {body[:200]!r}")
+
+
+async def call(
+    requester: Requester,
+    method: str,
+    path: str,
+    expected: int = 200,
+    **kwargs: Any,  # noqa: ANN401
+) -> bytes:
+    """Send a request and raise unless the response has the expected status."""
+    status, body = await requester(method, path, **kwargs)
+    if status != expected:
+        raise UnexpectedStatusError(path, status, body)
+    return body
+
+
+def percentile(sorted_samples: list[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, round(pct / 100 * (len(sorted_samples) - 1)))
+    return sorted_samples[index]
+
+
+def summarize(samples: list[float], elapsed: float | None = None) -> dict[str, float]:
+    """Summarize latencies, in seconds, as milliseconds plus throughput."""
+    ordered = sorted(samples)
+    total = elapsed if elapsed is not None else sum(samples)
+    return {
+        "count": len(ordered),
+        "throughput_rps": len(ordered) / total if total else 0.0,
+        "mean_ms": statistics.fmean(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+    }
+
+
+async def measure(
+    func: Callable[[int], Awaitable[Any]], iterations: int, concurrency: int = 1
+) -> dict[str, float]:
+    """Await `func(i)` for every `i` below `iterations` and summarize latencies.
+
+    `concurrency` workers share the iterations, so throughput is measured over
+    the wall-clock time of the whole run.
+    """
+    samples = []
+    indexes = iter(range(iterations))
+
+    async def worker() -> None:
+        for i in indexes:
+            t0 = time.perf_counter()
+            await func(i)
+            samples.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def measure_sync(func: Callable[[int], Any], iterations: int) -> dict[str, float]:
+    """Call `func(i)` sequentially `iterations` times and summarize latencies."""
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def print_table(results: dict[str, dict[str, float]]) -> None:
+    print(f"{'case':<40} {'count':>7} {'rps':>10} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, r in results.items():
+        print(
+            f"{name:<40} {r['count']:>7} {r['throughput_rps']:>10.1f}"
+            f" {r['p50_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms {r['p99_ms']:>8.2f}ms"
+        )
+
+
+def git_revision() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def save_results(
+    path: Path,
+    results: dict[str, dict[str, float]],
+    **params: Any,  # noqa: ANN401
+) -> None:
+    """Write results as JSON with the commit and parameters they were taken at.
+
+    Compare two such files with `python -m benchmarks.compare`.
+    """
+    document = {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now(UTC).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "params": params,
+        },
+        "results": results,
+    }
+    path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
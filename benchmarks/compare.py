@@ -0,0 +1,58 @@
+"""Compare two benchmark result files saved with `--output`.
+
+Usage:
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10,
+        help="exit with status 1 if a p50 grew by more than this many percent",
+    )
+    args = parser.parse_args()
+
+    before = json.loads(args.before.read_text(encoding="utf-8"))
+    after = json.loads(args.after.read_text(encoding="utf-8"))
+    print(
+        f"{before['meta']['revision'] or 'unknown'}"
+        f" -> {after['meta']['revision'] or 'unknown'}"
+    )
+    print(f"{'case':<40}" + "".join(f" {metric:>20}" for metric in METRICS))
+
+    regressed = []
+    for case, new in after["results"].items():
+        old = before["results"].get(case)
+        if old is None:
+            continue
+        cells = []
+        for metric in METRICS:
+            change = (
+                (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0
+            )
+            cells.append(f"{new[metric]:>9.2f}ms {change:>+7.1f}%")
+        print(f"{case:<40}" + "".join(f" {cell:>20}" for cell in cells))
+        if old["p50_ms"] and new["p50_ms"] > old["p50_ms"] * (1 + args.threshold / 100):
+            regressed.append(case)
+
+    if regressed:
+        print(f"p50 regressed by more than {args.threshold}%: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
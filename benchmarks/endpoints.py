@@ -0,0 +1,289 @@
+"""Load-test the HTTP endpoints against a large seeded database.
+
+In-process, over ASGI (seeds a temporary database first):
+    python -m benchmarks.endpoints --users 1000000 --apps 10000 --codes 1000000
+
+Against a running server, seed a database, serve it with the rate limits off,
+then point the benchmark at the server:
+    python -m benchmarks.endpoints --db /tmp/bench.db --seed-only
+    DB_CONN_URL=sqlite+aiosqlite:////tmp/bench.db RATE_LIMIT_LOGIN_PER_IP=0 \
+        RATE_LIMIT_LOGIN_PER_ACCOUNT=0 RATE_LIMIT_REGISTER_PER_IP=0 \
+        RATE_LIMIT_TOKEN_PER_IP=0 RATE_LIMIT_TOKEN_PER_CLIENT=0 \
+        uvicorn app.main:app --port 8000
+    python -m benchmarks.endpoints --url http://127.0.0.1:8000 --concurrency 32
+
+Seeding uses fixed names and secrets (see `benchmarks.common`), so runs are
+comparable. Pass `--output results.json` to keep the numbers for
+`python -m benchmarks.compare`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, ClassVar
+
+from benchmarks.common import (
+    Requester,
+    asgi_requester,
+    call,
+    client_id,
+    client_secret,
+    disable_rate_limits,
+    http_requester,
+    measure,
+    prepare_database,
+    print_table,
+    redirect_uri,
+    remove_database,
+    save_results,
+    seed_codes,
+    seed_oauth_apps,
+    seed_users,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+PASSWORD = "correct horse battery staple"  # noqa: S105
+CASES = [
+    "openid-configuration",
+    "jwks",
+    "client-info",
+    "login",
+    "register",
+    "approve-authorize",
+    "token",
+    "userinfo",
+    "client-credentials",
+]
+
+
+def seed(db_path: Path, users: int, apps: int, codes: int) -> None:
+    prepare_database(db_path)
+
+    from app.instance import hasher  # noqa: PLC0415
+
+    started = time.perf_counter()
+    seed_users(db_path, users, hasher.hash(PASSWORD))
+    seed_oauth_apps(db_path, apps)
+    seed_codes(db_path, codes, users, apps)
+    print(
+        f"seeded {users} users, {apps} apps and {codes} codes"
+        f" in {time.perf_counter() - started:.1f}s"
+    )
+
+
+class EndpointCases:
+    """One method per benchmarked endpoint, each sending request number `i`.
+
+    Token redeems the codes approved by approve-authorize, and userinfo uses the
+    access tokens returned by token, so those cases depend on each other.
+    """
+
+    requires: ClassVar[dict[str, str]] = {
+        "token": "approve-authorize",
+        "userinfo": "token",
+    }
+
+    def __init__(
+        self, requester: Requester, *, users: int, apps: int, iterations: int
+    ) -> None:
+        self.requester = requester
+        rand = random.Random(0)  # noqa: S311
+        self.user_targets = [rand.randrange(users) for _ in range(iterations)]
+        self.app_targets = [rand.randrange(apps) for _ in range(iterations)]
+        # Unique per run, so that registration can be benchmarked against a
+        # server that already holds the users of earlier runs
+        self.run_id = int(time.time()) % 1_000_000
+        self.cookie: dict[str, str] = {}
+        self.codes: list[tuple[int, str]] = [(0, "")] * iterations
+        self.access_tokens: list[str] = [""] * iterations
+
+    def case(self, name: str) -> Callable[[int], Awaitable[None]]:
+        return getattr(self, name.replace("-", "_"))
+
+    async def setup(self) -> None:
+        body = {"login": "user0", "password": PASSWORD}
+        response = await call(self.requester, "POST", "/api/login", json_body=body)
+        self.cookie = {"Cookie": f"token={json.loads(response)['token']}"}
+
+    async def openid_configuration(self, _: int) -> None:
+        await call(self.requester, "GET", "/.well-known/openid-configuration")
+
+    async def jwks(self, _: int) -> None:
+        await call(self.requester, "GET", "/.well-known/jwks.json")
+
+    async def client_info(self, i: int) -> None:
+        path = f"/api/client/{client_id(self.app_targets[i])}/info"
+        await call(self.requester, "GET", path)
+
+    async def login(self, i: int) -> None:
+        body = {"login": f"user{self.user_targets[i]}", "password": PASSWORD}
+        await call(self.requester, "POST", "/api/login", json_body=body)
+
+    async def register(self, i: int) -> None:
+        username = f"r{self.run_id}x{i}"
+        body = {
+            "username": username,
+            "password": PASSWORD,
+            "email": f"{username}@example.com",
+            "nickname": username,
+        }
+        await call(self.requester, "POST", "/api/register", json_body=body)
+
+    async def approve_authorize(self, i: int) -> None:
+        app_index = self.app_targets[i]
+        body = {
+            "client_id": client_id(app_index),
+            "redirect_uri": redirect_uri(app_index),
+            "scope": "openid profile email",
+        }
+        response = await call(
+            self.requester,
+            "POST",
+            "/api/approve_authorize",
+            json_body=body,
+            headers=self.cookie,
+        )
+        self.codes[i] = (app_index, json.loads(response)["code"])
+
+    async def token(self, i: int) -> None:
+        app_index, code = self.codes[i]
+        form = {
+            "grant_type": "authorization_code",
+            "code": code,
+            "client_id": client_id(app_index),
+            "client_secret": client_secret(app_index),
+            "redirect_uri": redirect_uri(app_index),
+        }
+        response = await call(self.requester, "POST", "/api/token", form=form)
+        self.access_tokens[i] = json.loads(response)["access_token"]
+
+    async def client_credentials(self, i: int) -> None:
+        app_index = self.app_targets[i]
+        form = {
+            "grant_type": "client_credentials",
+            "client_id": client_id(app_index),
+            "client_secret": client_secret(app_index),
+        }
+        await call(self.requester, "POST", "/api/token", form=form)
+
+    async def userinfo(self, i: int) -> None:
+        headers = {"Authorization": f"Bearer {self.access_tokens[i]}"}
+        await call(self.requester, "GET", "/api/userinfo", headers=headers)
+
+
+async def run_cases(
+    requester: Requester,
+    cases: list[str],
+    *,
+    users: int,
+    apps: int,
+    iterations: int,
+    concurrency: int,
+) -> dict[str, dict[str, float]]:
+    endpoint_cases = EndpointCases(
+        requester, users=users, apps=apps, iterations=iterations
+    )
+    await endpoint_cases.setup()
+
+    results: dict[str, dict[str, float]] = {}
+
+    async def run_case(case: str) -> None:
+        if case in results:
+            return
+        if case in EndpointCases.requires:
+            await run_case(EndpointCases.requires[case])
+        results[case] = await measure(
+            endpoint_cases.case(case), iterations, concurrency
+        )
+
+    for case in CASES:
+        if case in cases:
+            await run_case(case)
+    return results
+
+
+async def run_in_process(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    from app.instance import app  # noqa: PLC0415
+
+    disable_rate_limits()
+    async with app.router.lifespan_context(app):
+        return await run_cases(
+            asgi_requester(app),
+            args.cases,
+            users=args.users,
+            apps=args.apps,
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--apps", type=int, default=10_000)
+    parser.add_argument("--codes", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--cases",
+        type=lambda value: value.split(","),
+        default=CASES,
+        help=f"comma-separated subset of {','.join(CASES)}",
+    )
+    parser.add_argument("--url", help="benchmark a running server instead")
+    parser.add_argument("--db", type=Path, help="the SQLite file to seed")
+    parser.add_argument("--seed-only", action="store_true")
+    parser.add_argument("--output", type=Path, help="save the results as JSON")
+    args = parser.parse_args()
+
+    if unknown := set(args.cases) - set(CASES):
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    if args.url:
+        results = asyncio.run(
+            run_cases(
+                http_requester(args.url),
+                args.cases,
+                users=args.users,
+                apps=args.apps,
+                iterations=args.iterations,
+                concurrency=args.concurrency,
+            )
+        )
+    else:
+        db_path = args.db or Path(tempfile.gettempdir()) / "identity-bench.db"
+        seed(db_path, args.users, args.apps, args.codes)
+        if args.seed_only:
+            return
+        try:
+            results = asyncio.run(run_in_process(args))
+        finally:
+            if args.db is None:
+                remove_database(db_path)
+
+    print_table(results)
+    if args.output:
+        save_results(
+            args.output,
+            results,
+            mode="http" if args.url else "asgi",
+            users=args.users,
+            apps=args.apps,
+            codes=args.codes,
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark `/api/login` against a large seeded users table.
+
+Usage:
+    python -m benchmarks.login --users 200000 --iterations 500
+    python -m benchmarks.login --without-indexes  # compare with the old full scans
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import (
+    asgi_requester,
+    call,
+    disable_rate_limits,
+    measure,
+    prepare_database,
+    print_table,
+    remove_database,
+    save_results,
+    seed_users,
+)
+
+PASSWORD = "correct horse battery staple"  # noqa: S105
+
+
+async def run(
+    users: int, iterations: int, *, without_indexes: bool
+) -> dict[str, dict[str, float]]:
+    from app.instance import app  # noqa: PLC0415
+
+    disable_rate_limits()
+    requester = asgi_requester(app)
+    rand = random.Random(0)  # noqa: S311
+    targets = [rand.randrange(users) for _ in range(iterations)]
+
+    async def by_username(i: int) -> None:
+        body = {"login": f"user{targets[i]}", "password": PASSWORD}
+        await call(requester, "POST", "/api/login", json_body=body)
+
+    async def by_email(i: int) -> None:
+        body = {"login": f"user{targets[i]}@example.com", "password": PASSWORD}
+        await call(requester, "POST", "/api/login", json_body=body)
+
+    async def unknown_user(i: int) -> None:
+        body = {"login": f"nobody{i}", "password": PASSWORD}
+        await call(requester, "POST", "/api/login", 401, json_body=body)
+
+    suffix = " (no indexes)" if without_indexes else ""
+    async with app.router.lifespan_context(app):
+        results = {
+            f"login by username{suffix}": await measure(by_username, iterations),
+            f"login by email{suffix}": await measure(by_email, iterations),
+            f"login unknown user{suffix}": await measure(unknown_user, iterations),
+        }
+    print_table(results)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--without-indexes", action="store_true")
+    parser.add_argument("--output", type=Path, help="save the results as JSON")
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.gettempdir()) / "identity-bench-login.db"
+    prepare_database(db_path)
+
+    from app.instance import hasher  # noqa: PLC0415
+
+    seed_users(db_path, args.users, hasher.hash(PASSWORD))
+    if args.without_indexes:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("DROP INDEX ix_users_username")
+            conn.execute("DROP INDEX ix_users_email")
+
+    try:
+        results = asyncio.run(
+            run(args.users, args.iterations, without_indexes=args.without_indexes)
+        )
+    finally:
+        remove_database(db_path)
+    if args.output:
+        save_results(
+            args.output,
+            results,
+            users=args.users,
+            iterations=args.iterations,
+            without_indexes=args.without_indexes,
+        )
+
+
+if __name__ == "__main__":
+    main()
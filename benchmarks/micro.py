@@ -0,0 +1,83 @@
+"""Micro-benchmarks of the hot primitives: JWT, Argon2 and token minting.
+
+Usage:
+    python -m benchmarks.micro --iterations 2000 --output micro.json
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from benchmarks.common import measure_sync, print_table, save_results
+
+
+def private_pem(
+    private_key: ec.EllipticCurvePrivateKey | ed25519.Ed25519PrivateKey,
+) -> str:
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def run(iterations: int) -> dict[str, dict[str, float]]:
+    from app.instance import hasher, keyring  # noqa: PLC0415
+    from utils.keyring import Key  # noqa: PLC0415
+    from utils.randoms import random_str  # noqa: PLC0415
+    from utils.tokens import TokenKind, mint, mint_many  # noqa: PLC0415
+
+    es256_pem = private_pem(ec.generate_private_key(ec.SECP256R1()))
+    keyring.add(Key.from_pem("bench-es256", "ES256", private_pem=es256_pem))
+    eddsa_pem = private_pem(ed25519.Ed25519PrivateKey.generate())
+    keyring.add(Key.from_pem("bench-eddsa", "EdDSA", private_pem=eddsa_pem))
+
+    now = datetime.now(UTC)
+    payload = {"user_id": 1, "iss": "bench", "iat": now, "exp": now + timedelta(1)}
+    password = "correct horse battery staple"  # noqa: S105
+    hashed_password = hasher.hash(password)
+
+    results = {}
+    for kid, name in [
+        ("main", "RS256"),
+        ("bench-es256", "ES256"),
+        ("bench-eddsa", "EdDSA"),
+    ]:
+        token = keyring.sign(payload, kid=kid)
+        results[f"jwt sign {name}"] = measure_sync(
+            lambda _, kid=kid: keyring.sign(payload, kid=kid), iterations
+        )
+        results[f"jwt verify {name}"] = measure_sync(
+            lambda _, token=token: keyring.verify(token, issuer="bench"), iterations
+        )
+    results["argon2 hash"] = measure_sync(lambda _: hasher.hash(password), iterations)
+    results["argon2 verify"] = measure_sync(
+        lambda _: hasher.verify(hashed_password, password), iterations
+    )
+    results["random_str(32)"] = measure_sync(lambda _: random_str(32), iterations)
+    results["mint"] = measure_sync(lambda _: mint(TokenKind.ACCESS_TOKEN), iterations)
+    results["mint_many(100), per batch"] = measure_sync(
+        lambda _: mint_many(TokenKind.ACCESS_TOKEN, 100), iterations
+    )
+    print_table(results)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--output", type=Path, help="save the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+    if args.output:
+        save_results(args.output, results, iterations=args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark cold start: importing `app.main` and running the startup lifespan.
+
+Every sample is a fresh interpreter against a freshly migrated database, for each
+schema check mode:
+    python -m benchmarks.startup --iterations 20 --modes revision,full
+
+Pass `--max-ms 1500` to exit with status 1 when the median import plus startup
+time of the first mode exceeds it, e.g. in CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess  # noqa: S404
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import (
+    prepare_database,
+    print_table,
+    remove_database,
+    save_results,
+    summarize,
+)
+
+MODES = ["revision", "full", "off"]
+
+# Run in the child interpreter; prints the timings in seconds as JSON
+CHILD = """
+import asyncio, json, time
+
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def start() -> float:
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(start())
+print(json.dumps({"import": imported - started, "startup": ready - imported}))
+"""
+
+
+def sample(url: str, mode: str) -> dict[str, float]:
+    env = {
+        **os.environ,
+        "DB_CONN_URL": url,
+        "SCHEMA_CHECK": mode,
+        "LOG_LEVEL": "WARNING",
+    }
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", CHILD],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run(url: str, modes: list[str], iterations: int) -> dict[str, dict[str, float]]:
+    results = {}
+    for mode in modes:
+        samples = [sample(url, mode) for _ in range(iterations)]
+        imports = [s["import"] for s in samples]
+        startups = [s["startup"] for s in samples]
+        results[f"import [{mode}]"] = summarize(imports)
+        results[f"startup [{mode}]"] = summarize(startups)
+        results[f"total [{mode}]"] = summarize([
+            i + s for i, s in zip(imports, startups, strict=True)
+        ])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument(
+        "--modes",
+        type=lambda value: value.split(","),
+        default=["revision", "full"],
+        help=f"comma-separated subset of {','.join(MODES)}",
+    )
+    parser.add_argument("--max-ms", type=float, help="fail above this median")
+    parser.add_argument("--output", type=Path, help="save the results as JSON")
+    args = parser.parse_args()
+
+    if unknown := set(args.modes) - set(MODES):
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    db_path = Path(tempfile.gettempdir()) / "identity-bench-startup.db"
+    url = prepare_database(db_path)
+    try:
+        results = run(url, args.modes, args.iterations)
+    finally:
+        remove_database(db_path)
+
+    print_table(results)
+    if args.output:
+        save_results(args.output, results, modes=args.modes, iterations=args.iterations)
+
+    guarded = results[f"total [{args.modes[0]}]"]["p50_ms"]
+    if args.max_ms is not None and guarded > args.max_ms:
+        print(
+            f"startup took {guarded:.0f}ms, more than {args.max_ms:.0f}ms",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,144 @@
+import asyncio
+import contextlib
 import logging
-from collections.abc import AsyncGenerator
+import time
+import uuid
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Any
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import NullPool
 
 from settings import identity_app_settings
 
-logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
-
-engine = create_async_engine(
-    identity_app_settings.db_conn_url,
-    future=True,
-    connect_args={"check_same_thread": False},
+logging.getLogger("sqlalchemy.engine").setLevel(
+    logging.INFO if identity_app_settings.sql_echo else logging.WARNING
 )
 
+type SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+db_url = make_url(identity_app_settings.db_conn_url)
+is_sqlite = db_url.get_backend_name() == "sqlite"
+# In-memory databases exist per connection, so they cannot be split
+is_sqlite_file = is_sqlite and db_url.database not in {None, "", ":memory:"}
+
+
+def sqlite_pragmas(*, read_only: bool) -> list[str]:
+    settings = identity_app_settings
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.sqlite_busy_timeout}",
+        f"PRAGMA synchronous = {settings.sqlite_synchronous}",
+        f"PRAGMA cache_size = {settings.sqlite_cache_size}",
+        f"PRAGMA mmap_size = {settings.sqlite_mmap_size}",
+        f"PRAGMA temp_store = {settings.sqlite_temp_store}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # Persisted in the database file, so only the writer needs to set it
+        pragmas.insert(0, f"PRAGMA journal_mode = {settings.sqlite_journal_mode}")
+    return pragmas
+
+
+def create_sqlite_engine(*, read_only: bool, pool_size: int) -> AsyncEngine:
+    sqlite_engine = create_async_engine(
+        db_url,
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+    pragmas = sqlite_pragmas(read_only=read_only)
+
+    @event.listens_for(sqlite_engine.sync_engine, "connect")
+    def apply_pragmas(dbapi_connection: Any, _connection_record: Any) -> None:  # noqa: ANN401
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return sqlite_engine
+
+
+def create_server_engine() -> AsyncEngine:
+    settings = identity_app_settings
+    connect_args: dict[str, Any] = {}
+    if db_url.get_driver_name() == "asyncpg":
+        connect_args["prepared_statement_cache_size"] = settings.db_statement_cache_size
+        if not settings.db_statement_cache_size:
+            # Behind PgBouncer in transaction mode, statements of one client may
+            # land on server connections that already hold the same numbered
+            # name; unique names cannot collide
+            connect_args["prepared_statement_name_func"] = (
+                lambda: f"__asyncpg_{uuid.uuid4()}__"
+            )
+    if settings.db_null_pool:
+        return create_async_engine(
+            db_url, connect_args=connect_args, poolclass=NullPool
+        )
+    return create_async_engine(
+        db_url,
+        connect_args=connect_args,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+if is_sqlite_file:
+    # SQLite allows one writer at a time: keep a single writer connection and
+    # serialize its users in-process instead of failing with "database is locked"
+    engine = create_sqlite_engine(read_only=False, pool_size=1)
+    read_engine = create_sqlite_engine(
+        read_only=True, pool_size=identity_app_settings.sqlite_reader_pool_size
+    )
+    write_lock: AbstractAsyncContextManager[Any] = asyncio.Lock()
+elif is_sqlite:
+    engine = create_async_engine(db_url, connect_args={"check_same_thread": False})
+    read_engine = engine
+    write_lock = contextlib.nullcontext()
+else:
+    # Server databases handle concurrent writers themselves
+    engine = create_server_engine()
+    read_engine = engine
+    write_lock = contextlib.nullcontext()
+
 session_maker = async_sessionmaker(engine)
+read_session_maker = async_sessionmaker(read_engine)
+# Called with the seconds every write session waited for the write lock
+write_lock_observers: list[Callable[[float], None]] = []
+
 
+@asynccontextmanager
+async def write_session() -> AsyncIterator[AsyncSession]:
+    """Open a session on the writer engine, holding the write lock until it closes.
 
-async def get_db() -> AsyncGenerator[AsyncSession]:
-    async with session_maker() as db:
+    The lock is not reentrant: do not open a write session while holding another.
+    """
+    started = time.perf_counter()
+    async with write_lock:
+        waited = time.perf_counter() - started
+        for observe in write_lock_observers:
+            observe(waited)
+        async with session_maker() as db:
+            yield db
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession]:
+    async with read_session_maker() as db:
         yield db
+
+
+async def dispose_engines() -> None:
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
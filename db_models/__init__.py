@@ -1,8 +1,21 @@
 from __future__ import annotations
 
+from .access_token import AccessToken as AccessToken
 from .base import Base as Base
 from .code import Code as Code
 from .oauth_app import OAuthApp as OAuthApp
+from .rate_limit_counter import RateLimitCounter as RateLimitCounter
+from .refresh_token import RefreshToken as RefreshToken
+from .revoked_token import RevokedToken as RevokedToken
 from .user import User as User
 
-__all__ = ["Base", "Code", "OAuthApp", "User"]
+__all__ = [
+    "AccessToken",
+    "Base",
+    "Code",
+    "OAuthApp",
+    "RateLimitCounter",
+    "RefreshToken",
+    "RevokedToken",
+    "User",
+]
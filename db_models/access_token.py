@@ -0,0 +1,19 @@
+import datetime
+
+from sqlalchemy import ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db_models.base import Base, UTCDateTime
+
+
+class AccessToken(Base):
+    __tablename__ = "access_tokens"
+    token_hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # SHA-256
+    # None for tokens a client got for itself through client credentials
+    user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), index=True)
+    client_id: Mapped[str] = mapped_column(String(32))
+    scope: Mapped[str] = mapped_column(String(256))
+    expires_at: Mapped[datetime.datetime] = mapped_column(UTCDateTime, index=True)
+
+    def __repr__(self) -> str:
+        return f"<AccessToken(user_id={self.user_id}, client_id={self.client_id})>"
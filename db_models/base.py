@@ -1,5 +1,36 @@
+import datetime
+from typing import override
+
+from sqlalchemy import DateTime, Dialect, TypeDecorator
 from sqlalchemy.orm import DeclarativeBase
 
 
+class UTCDateTime(TypeDecorator[datetime.datetime]):
+    """A timezone-aware datetime stored in UTC and always read back as aware UTC.
+
+    SQLite keeps no offset and hands back naive datetimes, so values are
+    converted to UTC on the way in and tagged as UTC on the way out.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    @override
+    def process_bind_param(
+        self, value: datetime.datetime | None, dialect: Dialect
+    ) -> datetime.datetime | None:
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(datetime.UTC)
+        return value
+
+    @override
+    def process_result_value(
+        self, value: datetime.datetime | None, dialect: Dialect
+    ) -> datetime.datetime | None:
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=datetime.UTC)
+        return value
+
+
 class Base(DeclarativeBase):
     pass
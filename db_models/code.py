@@ -1,17 +1,25 @@
+import datetime
+
 from sqlalchemy import String
 from sqlalchemy.orm import Mapped, mapped_column
 
-from db_models.base import Base
+from db_models.base import Base, UTCDateTime
 
 
 class Code(Base):
     __tablename__ = "codes"
-    code: Mapped[str] = mapped_column(String(32), primary_key=True)
-    client_id: Mapped[str] = mapped_column(String(32))
+    code: Mapped[str] = mapped_column(String(64), primary_key=True)
+    client_id: Mapped[str] = mapped_column(String(32), index=True)
     scope: Mapped[str] = mapped_column(String(256))
     redirect_uri: Mapped[str] = mapped_column(String(256))
-    access_token: Mapped[str] = mapped_column(String(32))
-    id_token: Mapped[str] = mapped_column(String(1024))
+
+    # Claims snapshotted at approval; the id_token is only signed at redemption
+    user_id: Mapped[int]
+    nonce: Mapped[str | None] = mapped_column(String(256))
+    auth_time: Mapped[datetime.datetime] = mapped_column(UTCDateTime)
+
+    created_at: Mapped[datetime.datetime] = mapped_column(UTCDateTime)
+    expires_at: Mapped[datetime.datetime] = mapped_column(UTCDateTime, index=True)
 
     def __repr__(self) -> str:
         return f"<Code(code={self.code})>"
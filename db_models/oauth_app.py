@@ -14,6 +14,11 @@ class OAuthApp(Base):
     client_secret: Mapped[str] = mapped_column(String(32))
     redirect_uri: Mapped[str] = mapped_column(String(256))
     allowed_scopes: Mapped[str] = mapped_column(String(256))
+    # "opaque" or "jwt"; JWT access tokens are verified by resource servers
+    # against our JWKS without calling us
+    access_token_format: Mapped[str] = mapped_column(
+        String(8), default="opaque", server_default="opaque"
+    )
 
     def __repr__(self) -> str:
         return f"<OAuthApp(client_id={self.client_id})>"
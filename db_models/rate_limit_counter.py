@@ -0,0 +1,17 @@
+import datetime
+
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db_models.base import Base, UTCDateTime
+
+
+class RateLimitCounter(Base):
+    __tablename__ = "rate_limit_counters"
+    # `<limit>:<client>@<window index>`, e.g. `login:ip:203.0.113.7@29000000`
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    count: Mapped[int]
+    expires_at: Mapped[datetime.datetime] = mapped_column(UTCDateTime, index=True)
+
+    def __repr__(self) -> str:
+        return f"<RateLimitCounter(key={self.key}, count={self.count})>"
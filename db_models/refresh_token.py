@@ -0,0 +1,22 @@
+import datetime
+
+from sqlalchemy import ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db_models.base import Base, UTCDateTime
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    token_hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # SHA-256
+    # Every token rotated out of the same grant shares its family
+    family_id: Mapped[str] = mapped_column(String(32), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    client_id: Mapped[str] = mapped_column(String(32))
+    scope: Mapped[str] = mapped_column(String(256))
+    # Set once the token is exchanged; presenting it again means it leaked
+    used_at: Mapped[datetime.datetime | None] = mapped_column(UTCDateTime)
+    expires_at: Mapped[datetime.datetime] = mapped_column(UTCDateTime, index=True)
+
+    def __repr__(self) -> str:
+        return f"<RefreshToken(user_id={self.user_id}, client_id={self.client_id})>"
@@ -0,0 +1,17 @@
+import datetime
+
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db_models.base import Base, UTCDateTime
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    # Kept until the revoked JWT would have expired anyway
+    jti: Mapped[str] = mapped_column(String(64), primary_key=True)
+    revoked_at: Mapped[datetime.datetime] = mapped_column(UTCDateTime, index=True)
+    expires_at: Mapped[datetime.datetime] = mapped_column(UTCDateTime, index=True)
+
+    def __repr__(self) -> str:
+        return f"<RevokedToken(jti={self.jti})>"
@@ -3,7 +3,7 @@ import datetime
 from sqlalchemy import String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
-from db_models.base import Base
+from db_models.base import Base, UTCDateTime
 
 
 class User(Base):
@@ -11,11 +11,11 @@ class User(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
 
     # Basic Auth Info
-    username: Mapped[str] = mapped_column(String(16))
+    username: Mapped[str] = mapped_column(String(16), unique=True, index=True)
     hashed_password = mapped_column(String(128))  # Use Argon2id
 
     # Adv Auth Info
-    email: Mapped[str] = mapped_column(String(32))
+    email: Mapped[str] = mapped_column(String(32), unique=True, index=True)
 
     # Account Status
     activated: Mapped[bool] = mapped_column(default=False)
@@ -28,7 +28,7 @@ class User(Base):
     avatar_url: Mapped[str | None] = mapped_column(String(96))
     bio: Mapped[str | None] = mapped_column(Text())
     birth: Mapped[datetime.date | None]
-    joined_at: Mapped[datetime.datetime]
+    joined_at: Mapped[datetime.datetime] = mapped_column(UTCDateTime)
     website: Mapped[str | None] = mapped_column(String(64))
     phone: Mapped[str | None] = mapped_column(String(16))
 
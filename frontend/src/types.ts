@@ -3,6 +3,7 @@ export interface AuthorizeParams {
     response_type: string;
     scope: string;
     redirect_uri: string;
+    nonce?: string;
 }
 
 export interface ClientInfo {
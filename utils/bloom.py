@@ -0,0 +1,56 @@
+"""Utility Bloom filter for compact set membership tests."""
+
+from __future__ import annotations
+
+import hashlib
+import math
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+
+class BloomFilter:
+    """A set of strings that may answer false positives but no false negatives.
+
+    The filter is sized for `capacity` items at a false positive rate of
+    `error_rate`; it keeps working past that, with more false positives. Items
+    cannot be removed; build a new filter instead.
+
+    Args:
+        capacity (int): The number of items the filter is sized for.
+        error_rate (float): The wanted false positive rate at `capacity` items.
+        items (Iterable[str]): Items to add right away.
+
+    """
+
+    def __init__(
+        self, capacity: int, error_rate: float = 0.001, items: Iterable[str] = ()
+    ) -> None:
+        capacity = max(capacity, 1)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        for item in items:
+            self.add(item)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: two 64-bit halves of one digest make all the hashes
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8])
+        h2 = int.from_bytes(digest[8:]) | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
@@ -0,0 +1,79 @@
+"""Utility in-process caches."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable
+
+
+class TTLCache[K: Hashable, V]:
+    """A bounded LRU cache whose entries expire at a given time.
+
+    Entries expire either `ttl` seconds after insertion or at an explicit
+    `expires_at` timestamp, whichever the caller supplies. Once `maxsize` entries
+    are stored the least recently used one is evicted. Hit and miss counters are
+    kept for monitoring.
+
+    The cache is meant to be used from the event loop thread only and takes no
+    locks.
+
+    Args:
+        maxsize (int): The maximum number of entries.
+        ttl (float | None): The default lifetime of entries in seconds.
+        clock (Callable[[], float]): The clock `expires_at` is measured against.
+
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, *, expires_at: float | None = None) -> None:
+        if expires_at is None:
+            if self.ttl is None:
+                raise ValueError("Either ttl or expires_at is required")  # noqa: TRY003
+            expires_at = self.clock() + self.ttl
+
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        entry = self._data.pop(key, None)
+        return None if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
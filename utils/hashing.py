@@ -0,0 +1,165 @@
+"""Utility running password hashing off the event loop."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    import argon2
+
+
+class HashingBusyError(Exception):
+    """The hashing pool has too many pending jobs to accept another one."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Password hashing pool is busy")
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True, slots=True)
+class HashingStats:
+    """Snapshot of the hashing pool state."""
+
+    workers: int
+    in_flight: int
+    queue_depth: int
+    completed: int
+    rejected: int
+
+
+def _hash(hasher: argon2.PasswordHasher, password: str) -> str:
+    return hasher.hash(password)
+
+
+def _verify(hasher: argon2.PasswordHasher, hashed_password: str, password: str) -> bool:
+    return hasher.verify(hashed_password, password)
+
+
+class PasswordHashingService:
+    """Run Argon2 hash and verify calls in a bounded worker pool.
+
+    Argon2 is CPU-bound, so calling it from an async handler stalls every other
+    request on the worker. This service offloads the calls to a thread or process
+    pool and refuses new jobs once `max_pending` jobs are already waiting, so that a
+    burst of logins fails fast instead of piling up behind the pool.
+
+    Args:
+        hasher (argon2.PasswordHasher): The hasher holding the Argon2 parameters.
+        executor (Literal["thread", "process"]): The kind of pool to run jobs in.
+        max_workers (int): The number of workers in the pool.
+        max_pending (int): The maximum number of submitted but unfinished jobs.
+        retry_after (int): The seconds clients are asked to wait when rejected.
+        observe (Callable[[str, float], None] | None): Called with `"hash"` or
+            `"verify"` and the seconds the call took, including time queued.
+
+    """
+
+    def __init__(
+        self,
+        hasher: argon2.PasswordHasher,
+        *,
+        executor: Literal["thread", "process"] = "thread",
+        max_workers: int = 4,
+        max_pending: int = 64,
+        retry_after: int = 1,
+        observe: Callable[[str, float], None] | None = None,
+    ) -> None:
+        self.hasher = hasher
+        self.executor_kind = executor
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.observe = observe
+
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="argon2"
+                )
+        return self._executor
+
+    def stats(self) -> HashingStats:
+        return HashingStats(
+            workers=self.max_workers,
+            in_flight=min(self._pending, self.max_workers),
+            queue_depth=max(self._pending - self.max_workers, 0),
+            completed=self._completed,
+            rejected=self._rejected,
+        )
+
+    async def _submit[R](
+        self, operation: str, func: Callable[..., R], *args: object
+    ) -> R:
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise HashingBusyError(self.retry_after)
+
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(func, *args)
+            )
+        finally:
+            self._pending -= 1
+            self._completed += 1
+            if self.observe is not None:
+                self.observe(operation, time.perf_counter() - started)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password in the pool.
+
+        Args:
+            password (str): The password to hash.
+
+        Returns:
+            str: The encoded Argon2 hash.
+
+        Raises:
+            HashingBusyError: The pool is saturated.
+
+        """
+        return await self._submit("hash", _hash, self.hasher, password)
+
+    async def verify(self, hashed_password: str, password: str) -> bool:
+        """Verify a password against its hash in the pool.
+
+        Args:
+            hashed_password (str): The encoded Argon2 hash.
+            password (str): The password to check.
+
+        Returns:
+            bool: Always `True`; a mismatch raises instead.
+
+        Raises:
+            argon2.exceptions.VerifyMismatchError: The password does not match.
+            argon2.exceptions.VerificationError: The hash cannot be verified.
+            argon2.exceptions.InvalidHashError: The hash cannot be parsed.
+            HashingBusyError: The pool is saturated.
+
+        """
+        return await self._submit(
+            "verify", _verify, self.hasher, hashed_password, password
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,64 @@
+"""Utility serving pre-rendered documents with HTTP caching headers."""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from fastapi import Response
+
+if TYPE_CHECKING:
+    from fastapi import Request
+
+
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    """Check an ETag against an `If-None-Match` header using weak comparison.
+
+    Args:
+        etag (str): The quoted ETag of the current representation.
+        if_none_match (str | None): The raw `If-None-Match` header value.
+
+    Returns:
+        bool: Whether the client already holds the current representation.
+
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip().removeprefix("W/")  # noqa: PLW2901
+        if candidate in {"*", etag}:
+            return True
+    return False
+
+
+@dataclass(frozen=True, slots=True)
+class StaticDocument:
+    """A response body rendered once, along with its strong ETag."""
+
+    body: bytes
+    etag: str
+    media_type: str = "application/json"
+
+    @classmethod
+    def from_bytes(
+        cls, body: bytes, media_type: str = "application/json"
+    ) -> StaticDocument:
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        return cls(body=body, etag=f'"{digest}"', media_type=media_type)
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        """Build the response for a request, honouring `If-None-Match`.
+
+        Args:
+            request (Request): The incoming request.
+            cache_control (str): The `Cache-Control` header to send.
+
+        Returns:
+            Response: A 304 if the client's copy is current, otherwise the document.
+
+        """
+        headers = {"ETag": self.etag, "Cache-Control": cache_control}
+        if etag_matches(self.etag, request.headers.get("If-None-Match")):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type=self.media_type, headers=headers)
@@ -0,0 +1,276 @@
+"""Utility holding the parsed keys used to sign and verify JWTs."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any, Literal
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed448, ed25519, rsa
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm, RSAAlgorithm
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Mapping
+
+    from jwt.algorithms import AllowedPrivateKeys, AllowedPublicKeys
+
+type Algorithm = Literal["RS256", "ES256", "EdDSA"]
+
+_PRIVATE_KEY_TYPES = (
+    rsa.RSAPrivateKey,
+    ec.EllipticCurvePrivateKey,
+    ed25519.Ed25519PrivateKey,
+    ed448.Ed448PrivateKey,
+)
+_PUBLIC_KEY_TYPES: dict[str, tuple[type, ...]] = {
+    "RS256": (rsa.RSAPublicKey,),
+    "ES256": (ec.EllipticCurvePublicKey,),
+    "EdDSA": (ed25519.Ed25519PublicKey, ed448.Ed448PublicKey),
+}
+
+
+class UnknownKeyError(jwt.InvalidTokenError):
+    """The token was signed with a `kid` that is not in the keyring."""
+
+
+class KeyConfigError(ValueError):
+    """The key material does not match its declared algorithm."""
+
+
+@dataclass(frozen=True, slots=True)
+class Key:
+    """A parsed signing key.
+
+    Keys without a private half, or marked as retiring, are only used to verify
+    tokens that were signed before a rotation; they are still published in the JWKS.
+    """
+
+    kid: str
+    algorithm: Algorithm
+    public_key: AllowedPublicKeys
+    private_key: AllowedPrivateKeys | None = None
+    retiring: bool = False
+
+    @classmethod
+    def from_pem(
+        cls,
+        kid: str,
+        algorithm: Algorithm,
+        *,
+        private_pem: str | None = None,
+        public_pem: str | None = None,
+        retiring: bool = False,
+    ) -> Key:
+        """Parse a key from PEM strings.
+
+        Args:
+            kid (str): The key ID put in the header of tokens signed by this key.
+            algorithm (Algorithm): The JWS algorithm of the key.
+            private_pem (str | None): The PEM encoded private key.
+            public_pem (str | None): The PEM encoded public key. Derived from the
+                private key when omitted.
+            retiring (bool): Whether the key is only kept to verify old tokens.
+
+        Returns:
+            Key: The parsed key.
+
+        Raises:
+            KeyConfigError: Neither half is given, or the key type does not match the
+                algorithm.
+
+        """
+        private_key = None
+        if private_pem:
+            private_key = load_pem_private_key(private_pem.encode(), password=None)
+            if not isinstance(private_key, _PRIVATE_KEY_TYPES):
+                raise KeyConfigError(f"Key {kid!r} cannot be used with {algorithm}")  # noqa: TRY003
+
+        if public_pem:
+            public_key = load_pem_public_key(public_pem.encode())
+        elif private_key is not None:
+            public_key = private_key.public_key()
+        else:
+            raise KeyConfigError(f"Key {kid!r} has no key material")  # noqa: TRY003
+
+        if not isinstance(public_key, _PUBLIC_KEY_TYPES[algorithm]):
+            raise KeyConfigError(f"Key {kid!r} cannot be used with {algorithm}")  # noqa: TRY003
+        if isinstance(public_key, ec.EllipticCurvePublicKey) and not isinstance(
+            public_key.curve, ec.SECP256R1
+        ):
+            raise KeyConfigError(f"Key {kid!r} must use the P-256 curve for ES256")  # noqa: TRY003
+
+        return cls(
+            kid=kid,
+            algorithm=algorithm,
+            public_key=public_key,  # pyright: ignore[reportArgumentType]
+            private_key=private_key,
+            retiring=retiring,
+        )
+
+    @property
+    def can_sign(self) -> bool:
+        return self.private_key is not None and not self.retiring
+
+    def to_jwk(self) -> dict[str, Any]:
+        """Export the public half as a JWK.
+
+        Returns:
+            dict[str, Any]: The JWK with `kid`, `use` and `alg` set.
+
+        """
+        key = self.public_key
+        if isinstance(key, rsa.RSAPublicKey):
+            jwk = RSAAlgorithm.to_jwk(key, as_dict=True)
+        elif isinstance(key, ec.EllipticCurvePublicKey):
+            jwk = ECAlgorithm.to_jwk(key, as_dict=True)
+        else:
+            jwk = OKPAlgorithm.to_jwk(key, as_dict=True)
+        return {**jwk, "kid": self.kid, "use": "sig", "alg": self.algorithm}
+
+
+class KeyRing:
+    """Keys indexed by `kid`, parsed once and reused for every token.
+
+    Passing PEM strings to PyJWT parses them again on every call. The keyring keeps
+    ready-to-use key objects instead, signs with the configured signing key, and
+    picks the verification key from the token header with a single dict lookup.
+
+    `version` is bumped on every change so that callers can cache anything derived
+    from the key set, such as the rendered JWKS.
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[Key] = (),
+        signing_kid: str | None = None,
+        *,
+        observe: Callable[[str, float], None] | None = None,
+    ) -> None:
+        self._keys: dict[str, Key] = {}
+        self._signing_kid: str | None = None
+        self.version = 0
+        # Called with "sign" or "verify" and the seconds the operation took
+        self.observe = observe
+
+        for key in keys:
+            self.add(key)
+        if signing_kid is not None:
+            self.set_signing_key(signing_kid)
+
+    def __contains__(self, kid: str) -> bool:
+        return kid in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def keys(self) -> list[Key]:
+        return list(self._keys.values())
+
+    def get(self, kid: str) -> Key:
+        try:
+            return self._keys[kid]
+        except KeyError:
+            raise UnknownKeyError(f"Unknown kid {kid!r}") from None  # noqa: TRY003
+
+    def add(self, key: Key) -> None:
+        if key.kid in self._keys:
+            raise KeyConfigError(f"Duplicate kid {key.kid!r}")  # noqa: TRY003
+        self._keys[key.kid] = key
+        if self._signing_kid is None and key.can_sign:
+            self._signing_kid = key.kid
+        self.version += 1
+
+    def retire(self, kid: str) -> None:
+        """Stop signing with a key while still accepting tokens it signed."""
+        self._keys[kid] = replace(self.get(kid), retiring=True)
+        if self._signing_kid == kid:
+            self._signing_kid = next(
+                (k.kid for k in self._keys.values() if k.can_sign), None
+            )
+        self.version += 1
+
+    def remove(self, kid: str) -> None:
+        """Drop a key; tokens signed by it will no longer verify."""
+        self.retire(kid)
+        del self._keys[kid]
+        self.version += 1
+
+    def set_signing_key(self, kid: str) -> None:
+        if not self.get(kid).can_sign:
+            raise KeyConfigError(f"Key {kid!r} cannot be used for signing")  # noqa: TRY003
+        self._signing_kid = kid
+        self.version += 1
+
+    @property
+    def signing_key(self) -> Key:
+        if self._signing_kid is None:
+            raise KeyConfigError("No key available for signing")  # noqa: TRY003
+        return self._keys[self._signing_kid]
+
+    def sign(
+        self,
+        payload: Mapping[str, Any],
+        *,
+        kid: str | None = None,
+        headers: Mapping[str, Any] | None = None,
+    ) -> str:
+        """Sign a payload into a JWT.
+
+        Args:
+            payload (Mapping[str, Any]): The claims to sign.
+            kid (str | None): The key to sign with. Defaults to the signing key.
+            headers (Mapping[str, Any] | None): Extra JOSE headers.
+
+        Returns:
+            str: The encoded JWT.
+
+        """
+        key = self.signing_key if kid is None else self.get(kid)
+        if key.private_key is None or key.retiring:
+            raise KeyConfigError(f"Key {key.kid!r} cannot be used for signing")  # noqa: TRY003
+        started = time.perf_counter()
+        token = jwt.encode(
+            dict(payload),
+            key=key.private_key,
+            algorithm=key.algorithm,
+            headers={**(headers or {}), "kid": key.kid},
+        )
+        if self.observe is not None:
+            self.observe("sign", time.perf_counter() - started)
+        return token
+
+    def verify(self, token: str, **kwargs: Any) -> dict[str, Any]:  # noqa: ANN401
+        """Verify a JWT with the key named by its `kid` header.
+
+        Args:
+            token (str): The encoded JWT.
+            **kwargs: Passed to `jwt.decode`, e.g. `audience` or `options`.
+
+        Returns:
+            dict[str, Any]: The verified claims.
+
+        Raises:
+            jwt.InvalidTokenError: The token is malformed, expired, signed by an
+                unknown key or has a bad signature.
+
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        if not isinstance(kid, str):
+            raise UnknownKeyError("Token has no kid")  # noqa: TRY003
+        key = self.get(kid)
+        started = time.perf_counter()
+        try:
+            return jwt.decode(
+                token, key=key.public_key, algorithms=[key.algorithm], **kwargs
+            )
+        finally:
+            if self.observe is not None:
+                self.observe("verify", time.perf_counter() - started)
+
+    def jwks(self) -> list[dict[str, Any]]:
+        return [key.to_jwk() for key in self._keys.values()]
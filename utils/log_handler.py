@@ -1,6 +1,14 @@
 from __future__ import annotations
 
-from datetime import datetime
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
 from typing import TYPE_CHECKING, override
 
 from rich.logging import RichHandler
@@ -45,3 +53,76 @@ class MyHandler(RichHandler):
             line_no=None,
             link_path=record.pathname if self.enable_link_path else None,
         )
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as compact single-line JSON objects."""
+
+    @override
+    def format(self, record: LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+
+
+class SamplingFilter(logging.Filter):
+    """Let through only a random `rate` share of records."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    @override
+    def filter(self, record: LogRecord) -> bool:
+        return self.rate >= 1 or random.random() < self.rate  # noqa: S311
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """A `QueueHandler` that leaves formatting to the listener thread.
+
+    The stock handler formats the message and the traceback on the calling
+    thread. Here only the message arguments are merged, into a copy of the
+    record, since they may change once the call returns. The traceback is kept
+    for the listener to format; the queue is in-process, so records are never
+    pickled.
+    """
+
+    @override
+    def prepare(self, record: LogRecord) -> LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_json_logging(level: int | str) -> QueueListener:
+    """Send every record through a queue to a thread writing JSON lines to stdout.
+
+    Args:
+        level (int | str): The level of the root logger.
+
+    Returns:
+        QueueListener: The started listener; it is stopped and flushed at exit.
+
+    """
+    log_queue: queue.SimpleQueue[LogRecord] = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [_DeferredQueueHandler(log_queue)]
+    root.setLevel(level)
+    return listener
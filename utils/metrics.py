@@ -0,0 +1,269 @@
+"""Utility collecting Prometheus-style metrics in-process and across workers."""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, ClassVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+type Labels = tuple[str, ...]
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Metric(ABC):
+    """Base of all metrics: a name, a help text and the names of its labels.
+
+    Metrics are updated without locks. That is safe as long as they are only
+    updated from the event loop thread, which is where all of our hooks run.
+    """
+
+    kind: ClassVar[str]
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": [[list(labels), value] for labels, value in self.collect()],
+        }
+
+    @abstractmethod
+    def collect(self) -> Iterable[tuple[Labels, Any]]:
+        """Return the value of every label set."""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> Iterable[tuple[Labels, float]]:
+        return list(self._values.items())
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Labels = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: the count of every bucket (not cumulative), the count
+        # above the last bucket, then the sum of all observations
+        self._values: dict[Labels, list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [0] * (len(self.buckets) + 2)
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+    def collect(self) -> Iterable[tuple[Labels, list[float]]]:
+        return [(labels, list(entry)) for labels, entry in self._values.items()]
+
+
+class Gauge(Metric):
+    """A gauge whose values are read from a callback when metrics are collected."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Labels,
+        func: Callable[[], Iterable[tuple[Labels, float]]],
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.func = func
+
+    def collect(self) -> Iterable[tuple[Labels, float]]:
+        return list(self.func())
+
+
+class CounterFunc(Gauge):
+    """A counter whose running totals are kept elsewhere and read from a callback."""
+
+    kind = "counter"
+
+
+class MetricsRegistry:
+    """The metrics of one process, and their rendering in the text format.
+
+    With several worker processes, each one dumps its `snapshot` into a shared
+    directory with `write_snapshot`; whichever worker serves the scrape merges
+    them with `read_snapshots` and `render`.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register[M: Metric](self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name!r}")  # noqa: TRY003
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "metrics": {name: m.snapshot() for name, m in self._metrics.items()},
+        }
+
+    def render(self, snapshots: Iterable[dict[str, Any]] | None = None) -> str:
+        """Render metrics in the Prometheus text exposition format.
+
+        Args:
+            snapshots (Iterable[dict[str, Any]] | None): Snapshots of several
+                processes to add up. Defaults to this process only.
+
+        Returns:
+            str: The rendered metrics.
+
+        """
+        merged = merge_snapshots(snapshots or [self.snapshot()])
+        lines = []
+        for name, metric in merged.items():
+            lines.extend((
+                f"# HELP {name} {metric['help']}",
+                f"# TYPE {name} {metric['kind']}",
+            ))
+            labelnames = metric["labelnames"]
+            for labels, value in metric["values"].items():
+                pairs = list(zip(labelnames, labels, strict=True))
+                if metric["kind"] != "histogram":
+                    lines.append(f"{name}{format_labels(pairs)} {value}")
+                    continue
+                cumulative = 0
+                bounds = [*map(str, metric["buckets"]), "+Inf"]
+                for bound, count in zip(bounds, value[:-1], strict=True):
+                    cumulative += count
+                    le = format_labels([*pairs, ("le", bound)])
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.extend((
+                    f"{name}_sum{format_labels(pairs)} {value[-1]}",
+                    f"{name}_count{format_labels(pairs)} {cumulative}",
+                ))
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def merge_snapshots(snapshots: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Add up snapshots of several processes, label set by label set."""
+    merged: dict[str, Any] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot["metrics"].items():
+            target = merged.setdefault(name, {**metric, "values": {}})
+            for labels, value in metric["values"]:
+                key = tuple(labels)
+                current = target["values"].get(key)
+                if current is None:
+                    target["values"][key] = value
+                elif isinstance(value, list):
+                    target["values"][key] = [
+                        a + b for a, b in zip(current, value, strict=True)
+                    ]
+                else:
+                    target["values"][key] = current + value
+    return merged
+
+
+def write_snapshot(directory: Path, snapshot: dict[str, Any]) -> None:
+    """Atomically replace the snapshot file of this process in `directory`."""
+    path = directory / f"{snapshot['pid']}.json"
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(snapshot), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshots(directory: Path) -> list[dict[str, Any]]:
+    """Read the snapshots of every process that wrote to `directory`.
+
+    Counters and histograms of exited processes are kept, so that totals do not
+    drop when a worker restarts; their gauges are dropped. Empty the directory
+    when deploying.
+    """
+    snapshots = []
+    for path in directory.glob("*.json"):
+        try:
+            snapshot = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if not _is_alive(snapshot["pid"]):
+            snapshot["metrics"] = {
+                name: metric
+                for name, metric in snapshot["metrics"].items()
+                if metric["kind"] != "gauge"
+            }
+        snapshots.append(snapshot)
+    return snapshots
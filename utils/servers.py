@@ -1,7 +1,8 @@
 """Utility detecting which ASGI server is running the app."""
 
 import enum
-import inspect
+import functools
+import sys
 
 
 class ASGIServer(enum.StrEnum):
@@ -11,17 +12,18 @@ class ASGIServer(enum.StrEnum):
     UNKNOWN = "unknown"
 
 
+@functools.cache
 def detect_server() -> ASGIServer:
     """Detect which ASGI server is running the app.
 
-    This function detects server running the app by inspecting the calling stack.
+    A server imports itself before it imports the app, so checking the loaded
+    modules is enough. The result is computed once.
 
     Returns:
         ASGIServer: The ASGI server running the app.
 
     """
 
-    for x in inspect.stack():
-        if "uvicorn" in x.filename:
-            return ASGIServer.UVICORN
+    if "uvicorn" in sys.modules:
+        return ASGIServer.UVICORN
     return ASGIServer.UNKNOWN